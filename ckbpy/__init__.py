@@ -1,6 +1,30 @@
-from .effect import Key, Preset, Effect
-from .types import (RGBColor, ARGBColor,
-                    GradientColorStops, AGradientColorStops)
-from .params import (Long, Double, Bool, RGB, ARGB, Gradient, AGradient, Angle,
-                     String, Label)
-from .constants import Keypress, Time
+# Submodules are only imported once one of their names is used, so that ckb
+# querying an effect's info doesn't pay for importing all of ckbpy.
+_EXPORTS = {
+    'Key': 'effect', 'Preset': 'effect', 'Effect': 'effect',
+    'AsyncEffect': 'aio',
+    'Compositor': 'compositor', 'Layer': 'compositor',
+    'FrameBuffer': 'framebuffer',
+    'KeyAnimator': 'animation',
+    'Clock': 'clock',
+    'FormulaEffect': 'expr',
+    'RGBColor': 'types', 'ARGBColor': 'types',
+    'GradientColorStops': 'types', 'AGradientColorStops': 'types',
+    'Long': 'params', 'Double': 'params', 'Bool': 'params', 'RGB': 'params',
+    'ARGB': 'params', 'Gradient': 'params', 'AGradient': 'params',
+    'Angle': 'params', 'String': 'params', 'Label': 'params',
+    'Keypress': 'constants', 'Time': 'constants',
+    'run': 'launch',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module 'ckbpy' has no attribute '{name}'")
+    from importlib import import_module
+    value = getattr(import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,248 @@
+import os
+import sys
+import stat
+import asyncio
+from .effect import Effect
+from .frame import FrameWriter
+from .protocol import split_command, parse_keycount, parse_keymap_key
+
+
+class AsyncEffect(Effect):
+    """Effect running on an asyncio event loop.
+
+    ckb's commands are read from stdin without blocking the loop, so effects
+    can await other sources (sockets, subprocesses, timers) in tasks started
+    with create_task() while frames keep being delivered. The hooks (start,
+    stop, params_changed, param_changed, keypresses, keypress, advance_time and
+    update_colors) are coroutines; rebuild() is not.
+
+    render_ahead and coalesce are not supported; instrumentation is.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.render_ahead:
+            raise ValueError('AsyncEffect does not support render_ahead')
+        if self.coalesce:
+            raise ValueError('AsyncEffect does not support coalesce')
+        self.tasks = set()
+        self._readline = None
+
+    def main(self, stdin=None, stdout=None):
+        asyncio.run(self.main_async(stdin, stdout))
+
+    async def main_async(self, stdin=None, stdout=None):
+        self.stdin = stdin if stdin is not None else sys.stdin
+        self.stdout = stdout if stdout is not None else sys.stdout
+        self._readline = await self.open_stdin()
+
+        self.keys = await self.read_keymap_async()
+        self.frame_writer = FrameWriter(self.frame_buffer.names, self.stdout)
+        if self.batch_keys:
+            from .events import KeyEventQueue
+            self.key_events = KeyEventQueue(len(self.frame_buffer))
+        self.open_shared_frames()
+        if self.parallel is not None:
+            self.parallel.setup(self.geometry)
+            self.parallel.update_params(self.params)
+
+        await self.skip_until_async('begin params')
+        await self.read_param_values_async()
+
+        await self.skip_until_async('begin run')
+        print('begin run', file=self.stdout, flush=True)
+
+        # Main loop
+        handlers = self.command_handlers()
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            handlers = instrumentation.instrument_handlers(handlers)
+            instrumentation.attach(self)
+        try:
+            while True:
+                command, args = split_command(await self.read_line_async())
+                if command == 'end' and args == 'run':
+                    break
+                handler = handlers.get(command)
+                if handler is not None:
+                    await handler(args)
+        finally:
+            for task in list(self.tasks):
+                task.cancel()
+            if self.tasks:
+                await asyncio.gather(*self.tasks, return_exceptions=True)
+            if instrumentation is not None:
+                instrumentation.detach(self)
+                instrumentation.report()
+            self.close_shared_frames()
+            if self.parallel is not None:
+                self.parallel.close()
+
+        print('end run', file=self.stdout, flush=True)
+
+    async def open_stdin(self):
+        """Returns a coroutine function reading raw lines from stdin."""
+        loop = asyncio.get_running_loop()
+        try:
+            mode = os.fstat(self.stdin.fileno()).st_mode
+        except (OSError, ValueError):
+            mode = 0
+        if stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) or stat.S_ISCHR(mode):
+            reader = asyncio.StreamReader()
+            await loop.connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(reader), self.stdin)
+            return reader.readline
+
+        # stdin is a regular file (or not a file at all), which can't be
+        # watched by the loop
+        stdin = getattr(self.stdin, 'buffer', self.stdin)
+
+        async def readline():
+            return await loop.run_in_executor(None, stdin.readline)
+        return readline
+
+    def create_task(self, coro):
+        """Runs a coroutine alongside the effect until 'end run'."""
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def command_handlers(self):
+        return {
+            'time': self.handle_time,
+            'frame': self.handle_frame,
+            'key': self.read_key,
+            'start': self.handle_start,
+            'stop': self.handle_stop,
+            'begin': self.handle_begin,
+        }
+
+    async def handle_time(self, args):
+        value = float(args)
+        delta_t = self.update_current_time(value)
+        if self.clock is None:
+            if self.animator is not None:
+                self.animator.advance(delta_t)
+            await self.advance_time(value)
+            return
+        step = self.clock.step
+        for _ in range(self.tick(value)):
+            await self.advance_time(step)
+
+    async def handle_frame(self, args):
+        await self.print_frame()
+
+    async def handle_start(self, args):
+        self.request_full_frame()
+        self._last_absolute_time = None
+        if self.clock is not None:
+            self.clock.sync()
+        await self.start()
+
+    async def handle_stop(self, args):
+        await self.stop()
+
+    async def handle_begin(self, args):
+        if args == 'params':
+            await self.read_param_values_async()
+
+    async def read_line_async(self):
+        line = await self._readline()
+        if not line:
+            raise EOFError
+        if isinstance(line, bytes):
+            line = line.decode()
+        return line.rstrip('\n')
+
+    async def skip_until_async(self, string):
+        try:
+            while await self.read_line_async() != string:
+                pass
+        except EOFError:
+            print(f'Error [ckb-python]: Reached EOF looking for "{string}"',
+                  file=self.stdout)
+            exit(-2)
+
+    async def read_keymap_async(self):
+        await self.skip_until_async('begin keymap')
+
+        keycount = parse_keycount(await self.read_line_async())
+        if keycount is None:
+            print('Error [ckb-python]: "begin keymap" not followed by '
+                  '"keycount"', file=self.stdout)
+            exit(-3)
+
+        entries = []
+        while keycount > 0:
+            entry = parse_keymap_key(await self.read_line_async())
+            if entry is None:
+                continue
+            entries.append(entry)
+            keycount -= 1
+
+        keys = self.build_keymap(entries)
+        await self.skip_until_async('end keymap')
+        return keys
+
+    async def read_param_values_async(self):
+        changed = set()
+        try:
+            while True:
+                line = await self.read_line_async()
+                if line == 'end params':
+                    break
+
+                param = self.set_param_from_line(line)
+                if param is not None:
+                    changed.add(param.name)
+        except EOFError:
+            print('Error [ckb-python]: Reached EOF reading parameters',
+                  file=self.stdout)
+            exit(-2)
+
+        if changed:
+            self.pending_param_changes |= changed
+            await self.params_changed(changed)
+
+    async def read_key(self, args):
+        event = self.find_key(args)
+        if event is None:
+            return
+        if self.key_events is not None:
+            key, state = event
+            self.key_events.push(self.current_time, key.index, state)
+        else:
+            await self.keypress(*event)
+
+    async def render(self):
+        events = self.prepare_render()
+        if events:
+            await self.keypresses(events)
+            events.clear()
+        await self.update_colors()
+
+    async def print_frame(self):
+        await self.render()
+        self.write_frame()
+
+    async def params_changed(self, names):
+        for name in names:
+            await self.param_changed(self.params[name])
+
+    async def param_changed(self, param): pass
+
+    async def keypresses(self, events):
+        names = self.frame_buffer.names
+        for _, index, state in events:
+            await self.keypress(self.keys[names[index]], state)
+
+    async def keypress(self, key, state): pass
+
+    async def advance_time(self, delta_t): pass
+
+    async def start(self): pass
+
+    async def stop(self): pass
+
+    async def update_colors(self): pass
@@ -0,0 +1,89 @@
+LINEAR = 0
+EASE_IN = 1
+EASE_OUT = 2
+EASE_IN_OUT = 3
+
+# Easing curves mapping a phase in [0.0,1.0] onto [0.0,1.0]
+EASINGS = {
+    EASE_IN: lambda p: p * p,
+    EASE_OUT: lambda p: p * (2.0 - p),
+    EASE_IN_OUT: lambda p: p * p * (3.0 - 2.0 * p),
+}
+
+
+class KeyAnimator(object):
+    """Per-key tweens stored in NumPy arrays, advanced all at once.
+
+    Each key has a phase in [0.0,1.0] moving towards its target at its speed
+    (in phase per second). values holds the phases passed through each key's
+    easing curve, ready to be sampled from a gradient.
+    """
+
+    def __init__(self, key_count):
+        import numpy
+        self.phase = numpy.zeros(key_count)
+        self.target = numpy.zeros(key_count)
+        self.speed = numpy.ones(key_count)
+        self.easing = numpy.zeros(key_count, dtype=numpy.int8)
+        self.active = numpy.zeros(key_count, dtype=bool)
+        self.values = numpy.zeros(key_count)
+        # Keys whose value changed since the last sample()
+        self.changed = numpy.zeros(key_count, dtype=bool)
+        # Indices of the keys that reached their target in the last advance()
+        self.finished = numpy.zeros(0, dtype=numpy.intp)
+
+    def animate(self, indices, target, speed=1.0, easing=LINEAR):
+        """Starts moving the phase of the given keys towards a target."""
+        self.target[indices] = target
+        self.speed[indices] = speed
+        self.easing[indices] = easing
+        self.active[indices] = True
+
+    def set_phase(self, indices, phase):
+        """Jumps the given keys to a phase, stopping their animations."""
+        self.phase[indices] = phase
+        self.target[indices] = phase
+        self.active[indices] = False
+        self._update_values(indices)
+
+    def advance(self, delta_t):
+        """Moves all active animations forward by delta_t seconds."""
+        import numpy
+        active = numpy.flatnonzero(self.active)
+        if len(active) == 0:
+            self.finished = active
+            return self.finished
+
+        phase = self.phase[active]
+        target = self.target[active]
+        step = self.speed[active] * delta_t
+        phase += numpy.clip(target - phase, -step, step)
+        self.phase[active] = phase
+
+        done = phase == target
+        self.finished = active[done]
+        self.active[self.finished] = False
+        self._update_values(active)
+        return self.finished
+
+    def _update_values(self, indices):
+        phase = self.phase[indices]
+        values = phase.copy()
+        easing = self.easing[indices]
+        for easing_id, curve in EASINGS.items():
+            mask = easing == easing_id
+            if mask.any():
+                values[mask] = curve(phase[mask])
+        self.values[indices] = values
+        self.changed[indices] = True
+
+    def sample(self, gradient, frame_buffer):
+        """Writes the gradient's colors for all changed keys into a frame
+        buffer."""
+        import numpy
+        indices = numpy.flatnonzero(self.changed)
+        if len(indices) == 0:
+            return
+        gradient.get_colors_for_phases(self.values[indices],
+                                       out=frame_buffer, indices=indices)
+        self.changed[indices] = False
@@ -0,0 +1,220 @@
+import io
+import sys
+import time
+import random
+import inspect
+import argparse
+import importlib
+import tracemalloc
+from urllib.parse import quote
+from .params import ValueParam
+from . import record
+
+# Effect methods timed separately; everything else counts as parsing.
+# handle_time is reported without the advance_time calls it makes, which
+# leaves the clock and animator work.
+PHASES = ('update_colors', 'write_frame', 'handle_time', 'advance_time',
+          'keypress')
+
+
+class _NullSink(io.RawIOBase):
+    """Binary stream discarding everything written to it."""
+
+    def __init__(self):
+        self.bytes_written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return len(data)
+
+
+def synthetic_session(effect, keys=120, frames=600, fps=60.0,
+                      keypress_rate=0.2, seed=0):
+    """Generates a ckb protocol session for the given effect.
+
+    The keymap consists of keys named k0, k1, ... laid out in rows of 20,
+    the params are the effect's current values and each of the frames is
+    preceded by a 'time' line. keypress_rate is the average number of key
+    events per frame.
+    """
+    rng = random.Random(seed)
+    lines = ['begin keymap', f'keycount {keys}']
+    for i in range(keys):
+        lines.append(f'key k{i} {(i % 20) * 12},{(i // 20) * 12}')
+    lines.append('end keymap')
+
+    lines.append('begin params')
+    for param in effect.params.values():
+        if isinstance(param, ValueParam):
+            lines.append(f'param {param.name} {quote(str(param.value))}')
+    lines.append('end params')
+
+    lines.extend(['begin run', 'start'])
+    pressed = set()
+    for _ in range(frames):
+        events = int(keypress_rate) + (rng.random() < keypress_rate % 1)
+        for _ in range(events):
+            key = rng.randrange(keys)
+            state = 'up' if key in pressed else 'down'
+            pressed.symmetric_difference_update((key,))
+            if effect.kpmode == 'position':
+                lines.append(f'key {(key % 20) * 12},{(key // 20) * 12} '
+                             f'{state}')
+            else:
+                lines.append(f'key k{key} {state}')
+        lines.append(f'time {1.0 / fps}')
+        lines.append('frame')
+    lines.extend(['stop', 'end run'])
+    return '\n'.join(lines) + '\n'
+
+
+class BenchResult(object):
+    def __init__(self, frames, elapsed, phases, bytes_written,
+                 peak_memory=None, retained_memory=None, setup=0.0):
+        self.frames = frames
+        # Seconds spent in the run loop, after 'begin run'
+        self.elapsed = elapsed
+        # Seconds spent reading the keymap and params before it
+        self.setup = setup
+        self.phases = phases
+        self.bytes_written = bytes_written
+        self.peak_memory = peak_memory
+        self.retained_memory = retained_memory
+
+    @property
+    def fps(self):
+        return self.frames / self.elapsed if self.elapsed > 0 else 0.0
+
+    def report(self):
+        lines = [f'frames:    {self.frames} in {self.elapsed:.3f}s '
+                 f'({self.fps:.1f} frames/s)',
+                 f'setup:     {self.setup:.3f}s',
+                 f'output:    {self.bytes_written} bytes']
+        parse = self.elapsed - sum(self.phases.values())
+        for name, seconds in [('parse', parse)] + list(self.phases.items()):
+            per_frame = seconds / self.frames * 1e6 if self.frames else 0.0
+            share = seconds / self.elapsed * 100 if self.elapsed > 0 else 0.0
+            lines.append(f'{name + ":":<14} {seconds:8.4f}s '
+                         f'{per_frame:9.1f}us/frame {share:5.1f}%')
+        if self.peak_memory is not None:
+            lines.append(f'memory:    {self.peak_memory} bytes peak, '
+                         f'{self.retained_memory} bytes retained')
+        return '\n'.join(lines)
+
+
+def _timed(method, phases, name):
+    clock = time.perf_counter
+
+    if inspect.iscoroutinefunction(method):
+        # AsyncEffect hooks: time the awaited coroutine, not its creation
+        async def timed_async(*args):
+            start = clock()
+            try:
+                return await method(*args)
+            finally:
+                phases[name] += clock() - start
+        return timed_async
+
+    def timed(*args):
+        start = clock()
+        try:
+            return method(*args)
+        finally:
+            phases[name] += clock() - start
+    return timed
+
+
+def run_session(effect, session, trace_allocations=False):
+    """Feeds a protocol session through the effect's main() and measures it.
+
+    Only the run loop counts towards the frame rate; one-time setup such as
+    building the keymap (and first imports) is reported separately. Each
+    phase method is wrapped on the instance, so the numbers include the
+    wrapper overhead; use them to compare runs rather than as absolutes.
+    """
+    if isinstance(session, str):
+        session = session.encode()
+    stdin = io.TextIOWrapper(io.BytesIO(session))
+    sink = _NullSink()
+    stdout = io.TextIOWrapper(io.BufferedWriter(sink))
+
+    phases = dict((name, 0.0) for name in PHASES)
+    for name in PHASES:
+        setattr(effect, name, _timed(getattr(effect, name), phases, name))
+    # main() sets up the handlers once it has sent 'begin run'
+    command_handlers = effect.command_handlers
+    run_start = None
+
+    def timed_command_handlers():
+        nonlocal run_start
+        run_start = time.perf_counter()
+        return command_handlers()
+    effect.command_handlers = timed_command_handlers
+
+    if trace_allocations:
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        effect.main(stdin, stdout)
+    finally:
+        end = time.perf_counter()
+        if run_start is None:
+            run_start = end
+        for name in PHASES + ('command_handlers',):
+            delattr(effect, name)
+        peak_memory = retained_memory = None
+        if trace_allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peak_memory = peak - baseline
+            retained_memory = current - baseline
+    stdout.flush()
+
+    phases['handle_time'] -= phases['advance_time']
+    frames = session.count(b'\nframe\n')
+    return BenchResult(frames, end - run_start, phases, sink.bytes_written,
+                       peak_memory, retained_memory, run_start - start)
+
+
+def load_effect(spec):
+    """Creates an effect from a 'module:ClassName' (or factory) spec."""
+    module_name, _, attr = spec.partition(':')
+    module = importlib.import_module(module_name)
+    return getattr(module, attr or 'Effect')()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m ckbpy.bench',
+        description='Measures an effect by replaying a ckb protocol session.')
+    parser.add_argument('effect', help='module:ClassName of the effect')
+    parser.add_argument('--session', help='text file or ckbpy.record log '
+                        'containing a session; a synthetic one is generated '
+                        'otherwise')
+    parser.add_argument('--keys', type=int, default=120)
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--keypress-rate', type=float, default=0.2)
+    parser.add_argument('--allocations', action='store_true',
+                        help='trace memory allocations (slower)')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, '')
+    effect = load_effect(args.effect)
+    if args.session:
+        with open(args.session, 'rb') as f:
+            session = f.read()
+        if session.startswith(record.MAGIC):
+            session = record.session_input(args.session)
+    else:
+        session = synthetic_session(effect, args.keys, args.frames,
+                                    keypress_rate=args.keypress_rate)
+    result = run_session(effect, session, args.allocations)
+    print(result.report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+from .effect import Effect
+from .frame import FrameWriter
+from .shm import SharedFrameReader
+
+
+class BridgeEffect(Effect):
+    """Effect showing the frames another process publishes in a shared frame
+    file (see ckbpy.shm), e.g. an effect run with CKBPY_SHARED_FRAMES.
+
+    The file is looked up by key name, so the publishing effect may use
+    another keymap; keys it doesn't know stay dark. The file is reopened
+    whenever it is replaced.
+    """
+
+    def __init__(self, path=None, **kwargs):
+        if path is None:
+            path = os.environ.get('CKBPY_BRIDGE_SOURCE', '')
+        self.path = path
+        self.reader = None
+        self.sequence = None
+        # (own index, shared index) of every key found in the file
+        self.mapping = []
+        kwargs.setdefault('guid', '{5e7c0a52-2f7d-4c36-9a47-3b8e1c0d2f61}')
+        kwargs.setdefault('name', 'Shared frame bridge')
+        kwargs.setdefault('version', '0.1')
+        kwargs.setdefault('year', 2017)
+        kwargs.setdefault('author', 'ckbpy')
+        kwargs.setdefault('license', 'GPLv2')
+        kwargs.setdefault('description',
+                          'Shows frames rendered by another process.')
+        kwargs.setdefault('delta_frames', True)
+        super().__init__(**kwargs)
+
+    def open_reader(self):
+        """(Re)opens the shared frame file, returning whether it's open."""
+        if self.reader is not None and not self.reader.replaced():
+            return True
+        try:
+            reader = SharedFrameReader(self.path)
+        except (OSError, ValueError):
+            return self.reader is not None
+        if self.reader is not None:
+            self.reader.close()
+        self.reader = reader
+        self.sequence = None
+        shared_index = dict((name, i) for i, name in enumerate(reader.names))
+        self.mapping = [(i, shared_index[name])
+                        for i, name in enumerate(self.frame_buffer.names)
+                        if name in shared_index]
+        return True
+
+    def update_colors(self):
+        if not self.open_reader():
+            return
+        sequence, shared = self.reader.read()
+        if sequence == self.sequence:
+            return
+        self.sequence = sequence
+        frame_buffer = self.frame_buffer
+        colors = frame_buffer.colors
+        for index, shared_index in self.mapping:
+            color = shared[shared_index]
+            if colors[index] != color:
+                frame_buffer.set(index, color)
+
+    def stop(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+def dump(path, stream=None, interval=1 / 60, count=None):
+    """Writes each new frame of a shared frame file in ckb's frame format,
+    e.g. for consumers that only speak the text protocol."""
+    reader = SharedFrameReader(path)
+    writer = FrameWriter(reader.names, stream)
+    last = None
+    try:
+        while count is None or count > 0:
+            if reader.replaced():
+                reader.open()
+                writer = FrameWriter(reader.names, stream)
+                last = None
+            sequence, colors = reader.read()
+            if sequence != last:
+                writer.write(colors)
+                last = sequence
+                if count is not None:
+                    count -= 1
+            time.sleep(interval)
+    finally:
+        reader.close()
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+    if argv[1:] in (['--ckb-info'], ['--ckb-run']):
+        from .launch import run
+        run(BridgeEffect, argv)
+        return
+
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog='python -m ckbpy.bridge',
+        description='Prints the frames published in a shared frame file. '
+                    'Run with --ckb-info/--ckb-run (and CKBPY_BRIDGE_SOURCE '
+                    'set to the file) to act as a ckb effect instead.')
+    parser.add_argument('path', help='shared frame file')
+    parser.add_argument('--fps', type=float, default=60.0,
+                        help='how often to check for new frames')
+    parser.add_argument('--count', type=int,
+                        help='exit after this many frames')
+    args = parser.parse_args(argv[1:])
+    try:
+        dump(args.path, interval=1 / args.fps, count=args.count)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+class Clock(object):
+    """Fixed-timestep simulation clock fed by ckb's time commands.
+
+    Time from ckb is collected in an accumulator and consumed in steps of
+    exactly step seconds, so simulations advance the same way at any frame
+    rate. At most max_steps steps are taken per time command; any time
+    beyond that is dropped rather than making the next frames even slower
+    to catch up. Time that is left over, less than a step, is reflected by
+    alpha for interpolating between the last two simulation states.
+    """
+
+    def __init__(self, step=1 / 60, max_steps=8):
+        self.step = step
+        self.max_steps = max_steps
+        # Simulated time, a multiple of step
+        self.time = 0.0
+        self.steps = 0
+        self.accumulator = 0.0
+        # Seconds dropped because of max_steps
+        self.dropped = 0.0
+        self._last_absolute = None
+
+    @property
+    def alpha(self):
+        """How far the real time is into the next step, in [0.0,1.0)."""
+        return self.accumulator / self.step
+
+    def interpolate(self, previous, current):
+        """Blends the states before and after the last step by alpha; works
+        for numbers and NumPy arrays alike."""
+        return previous + (current - previous) * self.alpha
+
+    def advance(self, delta_t):
+        """Adds delta_t seconds, returning the number of steps to take."""
+        self.accumulator += max(0.0, delta_t)
+        # Tolerate rounding errors, e.g. 0.3 being 2.9999... steps of 0.1
+        steps = int(self.accumulator / self.step + 1e-9)
+        if steps > self.max_steps:
+            dropped = (steps - self.max_steps) * self.step
+            self.accumulator -= dropped
+            self.dropped += dropped
+            steps = self.max_steps
+        self.accumulator = max(0.0, self.accumulator - steps * self.step)
+        self.steps += steps
+        self.time = self.steps * self.step
+        return steps
+
+    def advance_to(self, time):
+        """Advances to an absolute time as sent with Time.ABSOLUTE,
+        returning the number of steps to take."""
+        last = self._last_absolute
+        self._last_absolute = time
+        if last is None:
+            return 0
+        return self.advance(time - last)
+
+    def sync(self):
+        """Makes the next absolute time the new reference instead of
+        advancing by the time since the last one, e.g. after a restart."""
+        self._last_absolute = None
@@ -0,0 +1,93 @@
+from .effect import Effect
+from .types import BLEND_MODES, blend_packed
+
+
+class Layer(object):
+    def __init__(self, effect, mode='normal', opacity=1.0):
+        if mode not in BLEND_MODES:
+            raise ValueError(f'Unknown blend mode "{mode}"')
+        self.effect = effect
+        self.mode = mode
+        self.opacity = opacity
+
+
+class Compositor(Effect):
+    """Runs several effects in one process and blends their frames.
+
+    Each layer's effect gets its own keys and frame buffer for the shared
+    keymap and receives all of ckb's events; nothing but the compositor talks
+    to ckb. Params with the same name are shared between layers. Layers are
+    blended bottom to top, and only keys that changed in any layer are
+    blended again.
+    """
+
+    def __init__(self, layers, *args, **kwargs):
+        self.layers = [layer if isinstance(layer, Layer) else Layer(layer)
+                       for layer in layers]
+
+        params = {}
+        for layer in self.layers:
+            layer_params = layer.effect.params
+            for name, param in list(layer_params.items()):
+                # Layers share a single param object per name
+                layer_params[name] = params.setdefault(name, param)
+        kwargs.setdefault('params', list(params.values()))
+        super().__init__(*args, **kwargs)
+
+    def build_keymap(self, entries):
+        keys = super().build_keymap(entries)
+        for layer in self.layers:
+            layer.effect.keys = layer.effect.build_keymap(entries)
+        return keys
+
+    def params_changed(self, names):
+        for layer in self.layers:
+            layer_names = set(name for name in names
+                              if name in layer.effect.params)
+            if layer_names:
+                layer.effect.pending_param_changes |= layer_names
+                layer.effect.params_changed(layer_names)
+
+    def keypress(self, key, state):
+        for layer in self.layers:
+            layer_key = layer.effect.keys.get(key.name, None)
+            if layer_key is not None:
+                layer.effect.keypress(layer_key, state)
+
+    def handle_time(self, args):
+        super().handle_time(args)
+        # Through the layers' handlers, so their animators, clocks and
+        # current times advance; ckb sends times in the compositor's mode
+        for layer in self.layers:
+            layer.effect.handle_time(args)
+
+    def handle_start(self, args):
+        super().handle_start(args)
+        for layer in self.layers:
+            layer.effect.handle_start(args)
+            layer.effect.frame_buffer.mark_all_dirty()
+
+    def stop(self):
+        for layer in self.layers:
+            layer.effect.stop()
+
+    def update_colors(self):
+        changed = set()
+        for layer in self.layers:
+            layer.effect.render()
+            changed |= layer.effect.frame_buffer.dirty
+
+        frame_buffer = self.frame_buffer
+        colors = frame_buffer.colors
+        layers = [(layer.effect.frame_buffer, layer.mode, layer.opacity)
+                  for layer in self.layers]
+        for index in changed:
+            color = 0
+            for layer_buffer, mode, opacity in layers:
+                color = blend_packed(color, layer_buffer.colors[index], mode,
+                                     opacity)
+            if color != colors[index]:
+                frame_buffer.set(index, color)
+
+        for layer_buffer, _, _ in layers:
+            layer_buffer.dirty.clear()
@@ -1,16 +1,38 @@
-import re
-import logging
-from urllib.parse import quote, unquote
-from .types import ARGBColor
+import os
+import sys
+from .frame import FrameWriter
+from .framebuffer import FrameBuffer, ColorView
+from .spatial import KeyIndex
+from .protocol import (split_command, parse_keycount, parse_keymap_key,
+                       parse_param, parse_key_event, LineReader, quote)
 from .constants import Keypress, Time
 
 
+def process_path(path, pid=None):
+    """Expands {pid} in a path so processes don't share a file."""
+    if pid is None:
+        pid = os.getpid()
+    return path.replace('{pid}', str(pid))
+
+
 class Key(object):
-    def __init__(self, name, x, y):
+    def __init__(self, name, x, y, index=0, frame_buffer=None):
         self.name = name
         self.x = x
         self.y = y
-        self.color = ARGBColor()
+        self.index = index
+        if frame_buffer is None:
+            frame_buffer = FrameBuffer([name])
+        self.frame_buffer = frame_buffer
+        self._color = ColorView(frame_buffer, index)
+
+    @property
+    def color(self):
+        return self._color
+
+    @color.setter
+    def color(self, value):
+        self.frame_buffer.set(self.index, value)
 
 
 class Preset(object):
@@ -29,7 +51,10 @@ class Effect(object):
     def __init__(self, guid, name, version, year, author, license,
                  description='', kpmode=Keypress.NAME, time=Time.DURATION,
                  repeat=False, preempt=False, live_params=True,
-                 params=[], presets=[]):
+                 params=[], presets=[], delta_frames=False,
+                 render_ahead=False, instrumentation=None, coalesce=False,
+                 shared_frames=None, parallel=None, clock=None,
+                 batch_keys=False):
         self.guid = guid
         self.name = name
         self.version = version
@@ -43,11 +68,54 @@ class Effect(object):
         self.preempt = preempt
         self.live_params = live_params
         self.params = dict((p.name, p) for p in params)
+        # Raw values last received from ckb, to skip unchanged params
+        self.param_strings = {}
+        # Params changed since the last rebuild()
+        self.pending_param_changes = set()
         self.presets = presets if len(presets) > 0 else [Preset(name)]
+        # Only send keys whose color changed since the last frame
+        self.delta_frames = delta_frames
+        # Render the next frame in a background thread after each frame
+        self.render_ahead = render_ahead
+        # ckbpy.instrument.Instrumentation timing the main loop, if any
+        self.instrumentation = instrumentation
+        # Merge time and frame commands that queued up while rendering
+        self.coalesce = coalesce
+        self.coalesced_times = 0
+        self.dropped_frames = 0
+        # Path of a file to also publish frames in (see ckbpy.shm)
+        self.shared_frames = shared_frames
+        self.shared_frame_writer = None
+        # ckbpy.parallel.ParallelRenderer used by render_parallel(), if any
+        self.parallel = parallel
 
         self.keys = {}
-
-    def run(self, argv):
+        self.frame_buffer = FrameBuffer([])
+        self.key_index = KeyIndex([])
+        self._geometry = None
+        # ckbpy.animation.KeyAnimator advanced with every 'time' command
+        self.animator = None
+        # ckbpy.clock.Clock turning time commands into fixed steps, if any
+        self.clock = clock
+        # ckb's time as of the last time command, in seconds
+        self.current_time = 0.0
+        self._last_absolute_time = None
+        # Queue key events and hand them to keypresses() once per frame
+        self.batch_keys = batch_keys
+        self.key_events = None
+        self.frame_writer = None
+        self.render_worker = None
+        self.full_frame_pending = True
+        self.stdin = sys.stdin
+        self.stdout = sys.stdout
+
+    def run(self, argv, record=None):
+        """Runs the effect as requested by ckb's command line arguments.
+
+        If record (or the CKBPY_RECORD environment variable) names a file,
+        the session's traffic is appended to it; see ckbpy.record.
+        """
+        import logging
         logging.debug(f'starting effect with {argv}')
         if len(argv) == 2:
             try:
@@ -55,7 +123,11 @@ class Effect(object):
                     self.print_info()
                     return
                 elif argv[1] == '--ckb-run':
-                    self.main()
+                    record = self.apply_environment(record)
+                    if record:
+                        self.main_recorded(record)
+                    else:
+                        self.main()
                     return
             except Exception:
                 logging.exception('An unexpected exception occurred')
@@ -64,7 +136,37 @@ class Effect(object):
         print('This program must be run from within ckb')
         exit(-1)
 
+    def apply_environment(self, record=None):
+        """Applies the CKBPY_STATS and CKBPY_SHARED_FRAMES settings, returning
+        the file to record the session to (record or CKBPY_RECORD), if any."""
+        stats = os.environ.get('CKBPY_STATS')
+        if stats and self.instrumentation is None:
+            from .instrument import Instrumentation
+            self.instrumentation = Instrumentation.from_spec(stats)
+        shared_frames = os.environ.get('CKBPY_SHARED_FRAMES')
+        if shared_frames and self.shared_frames is None:
+            self.shared_frames = shared_frames
+        return record or os.environ.get('CKBPY_RECORD')
+
+    def main_recorded(self, path, stdin=None, stdout=None):
+        """Runs main() while recording its input and output to a file."""
+        from .record import SessionRecorder, INPUT
+        stdin = stdin if stdin is not None else sys.stdin
+        stdout = stdout if stdout is not None else sys.stdout
+        with SessionRecorder(process_path(path)) as recorder:
+            recorded_stdin, recorded_stdout = recorder.wrap(stdin, stdout)
+            if self.coalesce:
+                # The coalescing reader needs stdin's file descriptor, so
+                # it records what it reads itself
+                recorded_stdin = LineReader(stdin, on_data=lambda data:
+                                            recorder.record(INPUT, data))
+            self.main(recorded_stdin, recorded_stdout)
+
     def print_info(self):
+        sys.stdout.write(self.info_string())
+
+    def info_string(self):
+        """Returns the effect's description as expected by --ckb-info."""
         info = [
             f'guid {quote(self.guid)}',
             f'name {quote(self.name)}',
@@ -81,125 +183,438 @@ class Effect(object):
         ]
         info.extend([f'param {p.param_string}' for p in self.params.values()])
         info.extend([f'preset {p}' for p in self.presets])
-        print('\n'.join(info))
+        return '\n'.join(info) + '\n'
+
+    def main(self, stdin=None, stdout=None):
+        self.stdin = stdin if stdin is not None else sys.stdin
+        self.stdout = stdout if stdout is not None else sys.stdout
+        if self.coalesce and not isinstance(self.stdin, LineReader):
+            self.stdin = LineReader(self.stdin)
 
-    def main(self):
         self.keys = self.read_keymap()
+        self.frame_writer = FrameWriter(self.frame_buffer.names, self.stdout)
+        if self.batch_keys:
+            from .events import KeyEventQueue
+            self.key_events = KeyEventQueue(len(self.frame_buffer))
+        self.open_shared_frames()
+        if self.parallel is not None:
+            self.parallel.setup(self.geometry)
+            self.parallel.update_params(self.params)
 
         self.skip_until('begin params')
         self.read_param_values()
 
         self.skip_until('begin run')
-        print('begin run')
+        print('begin run', file=self.stdout, flush=True)
+
+        handlers = self.command_handlers()
+        if self.render_ahead:
+            from .render import RenderWorker
+            self.render_worker = RenderWorker(self)
+            for command, handler in handlers.items():
+                if command != 'frame':
+                    handlers[command] = self.render_worker.locked(handler)
+            self.render_worker.start()
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            handlers = instrumentation.instrument_handlers(handlers)
+            instrumentation.attach(self)
 
-        # Main loop
+        try:
+            if self.coalesce:
+                self.run_coalescing(handlers)
+            else:
+                self.run_loop(handlers)
+        finally:
+            if self.render_worker is not None:
+                self.render_worker.stop()
+                self.render_worker = None
+            if instrumentation is not None:
+                instrumentation.detach(self)
+                instrumentation.report()
+            self.close_shared_frames()
+            if self.parallel is not None:
+                self.parallel.close()
+
+        print('end run', file=self.stdout, flush=True)
+
+    def run_loop(self, handlers):
+        """Dispatches commands until 'end run'."""
+        readline = self.stdin.readline
         while True:
-            line = self.read_line()
-            if line == 'end run':
+            line = readline()
+            if not line:
+                raise EOFError('Reached EOF before "end run"')
+            command, args = split_command(line.rstrip('\n'))
+            if command == 'end' and args == 'run':
                 break
-            elif line == 'start':
-                self.start()
-            elif line == 'stop':
-                self.stop()
-            elif line == 'begin params':
-                self.read_param_values()
-            elif line.startswith('key'):
-                self.read_key(line)
-            elif line == 'frame':
-                self.print_frame()
-            elif line.startswith('time'):
-                self.advance_time(float(line.split(' ')[1]))
-
-        print('end run')
+            handler = handlers.get(command)
+            if handler is not None:
+                handler(args)
+
+    def run_coalescing(self, handlers):
+        """Dispatches commands until 'end run', merging all 'time' and
+        'frame' commands waiting in the pipe.
+
+        Consecutive time deltas are summed up (absolute times replaced) and
+        only one frame is rendered once no more input is waiting, so the
+        effect catches up with ckb instead of rendering stale frames.
+        """
+        reader = self.stdin
+        absolute_time = self.time == Time.ABSOLUTE
+        handle_time = handlers['time']
+        handle_frame = handlers['frame']
+        instrumentation = self.instrumentation
+        pending_time = None
+        time_count = 0
+        frame_count = 0
+
+        def catch_up(render):
+            nonlocal pending_time, time_count, frame_count
+            if pending_time is not None:
+                handle_time(repr(pending_time))
+                self.coalesced_times += time_count - 1
+                pending_time = None
+                time_count = 0
+            if render and frame_count > 0:
+                handle_frame('')
+                self.dropped_frames += frame_count - 1
+                frame_count = 0
+            if instrumentation is not None:
+                instrumentation.coalesced_times = self.coalesced_times
+                instrumentation.dropped_frames = self.dropped_frames
+
+        while True:
+            line = reader.readline()
+            if not line:
+                raise EOFError('Reached EOF before "end run"')
+            command, args = split_command(line.rstrip('\n'))
+
+            if command == 'time':
+                value = float(args)
+                if pending_time is None or absolute_time:
+                    pending_time = value
+                else:
+                    pending_time += value
+                time_count += 1
+            elif command == 'frame':
+                frame_count += 1
+            else:
+                # Key events only need to see the time up to this point;
+                # anything else also gets the frames requested before it.
+                catch_up(render=command != 'key')
+                if command == 'end' and args == 'run':
+                    break
+                handler = handlers.get(command)
+                if handler is not None:
+                    handler(args)
+
+            if not reader.drain():
+                # No more input waiting: render the latest frame
+                catch_up(render=True)
+
+    def command_handlers(self):
+        """Maps the first word of each run-time command to its handler."""
+        return {
+            'time': self.handle_time,
+            'frame': self.handle_frame,
+            'key': self.read_key,
+            'start': self.handle_start,
+            'stop': self.handle_stop,
+            'begin': self.handle_begin,
+        }
+
+    def handle_time(self, args):
+        value = float(args)
+        delta_t = self.update_current_time(value)
+        if self.clock is None:
+            if self.animator is not None:
+                self.animator.advance(delta_t)
+            self.advance_time(value)
+            return
+        step = self.clock.step
+        for _ in range(self.tick(value)):
+            self.advance_time(step)
+
+    def update_current_time(self, value):
+        """Updates current_time from a time command's value, returning the
+        seconds it advanced by. The first absolute time after starting only
+        sets the reference, like Clock.advance_to()."""
+        if self.time != Time.ABSOLUTE:
+            self.current_time += value
+            return value
+        last = self._last_absolute_time
+        self._last_absolute_time = value
+        self.current_time = value
+        if last is None:
+            return 0.0
+        return max(0.0, value - last)
+
+    def tick(self, value):
+        """Feeds a time command's value to the clock, returning the number
+        of fixed steps to simulate; the animator is advanced by all of them
+        at once."""
+        clock = self.clock
+        if self.time == Time.ABSOLUTE:
+            steps = clock.advance_to(value)
+        else:
+            steps = clock.advance(value)
+        if steps and self.animator is not None:
+            self.animator.advance(steps * clock.step)
+        return steps
+
+    def handle_frame(self, args):
+        self.print_frame()
+
+    def handle_start(self, args):
+        self.request_full_frame()
+        self._last_absolute_time = None
+        if self.clock is not None:
+            self.clock.sync()
+        self.start()
+
+    def handle_stop(self, args):
+        self.stop()
+
+    def handle_begin(self, args):
+        if args == 'params':
+            self.read_param_values()
 
     def read_line(self):
-        return ' '.join(unquote(w) for w in input().split(' '))
+        line = self.stdin.readline()
+        if not line:
+            raise EOFError
+        return line.rstrip('\n')
 
     def skip_until(self, string):
         try:
             while self.read_line() != string:
                 pass
         except EOFError:
-            print(f'Error [ckb-python]: Reached EOF looking for "{string}"')
+            print(f'Error [ckb-python]: Reached EOF looking for "{string}"',
+                  file=self.stdout)
             exit(-2)
 
     def read_keymap(self):
         self.skip_until('begin keymap')
 
-        match = re.search(r'^keycount ([\d]+)', self.read_line())
-        if match is None:
+        keycount = parse_keycount(self.read_line())
+        if keycount is None:
             print('Error [ckb-python]: "begin keymap" not followed by '
-                  '"keycount"')
+                  '"keycount"', file=self.stdout)
             exit(-3)
 
-        keycount = int(match.group(1))
-        keys = {}
+        entries = []
         while keycount > 0:
-            match = re.search(r'^key (\w+) (\d+),(\d+)', self.read_line())
-            if match is None:
+            entry = parse_keymap_key(self.read_line())
+            if entry is None:
                 continue
-            key_name = unquote(match.group(1))
-            key_x = int(match.group(2))
-            key_y = int(match.group(3))
-            keys[key_name] = Key(key_name, key_x, key_y)
+            entries.append(entry)
             keycount -= 1
 
+        keys = self.build_keymap(entries)
         self.skip_until('end keymap')
         return keys
 
+    def build_keymap(self, entries):
+        """Creates the keys, frame buffer and key index for a list of
+        (name, x, y) entries."""
+        self.frame_buffer = FrameBuffer(name for name, _, _ in entries)
+        keys = {}
+        for index, (key_name, key_x, key_y) in enumerate(entries):
+            keys[key_name] = Key(key_name, key_x, key_y,
+                                 index, self.frame_buffer)
+        self.key_index = KeyIndex(keys.values())
+        self._geometry = None
+        return keys
+
+    @property
+    def geometry(self):
+        """Key coordinates as NumPy arrays (see KeyGeometry)."""
+        if self._geometry is None:
+            from .geometry import KeyGeometry
+            self._geometry = KeyGeometry(self.keys.values())
+        return self._geometry
+
     def read_param_values(self):
+        changed = set()
         try:
             while True:
                 line = self.read_line()
                 if line == 'end params':
                     break
 
-                match = re.search(r'^param (\w+) (.+)', line)
-                if match is None:
-                    continue
-
-                param_name = match.group(1)
-                if param_name not in self.params:
-                    continue
-
-                param = self.params[param_name]
-
-                value_str = match.group(2)
-                param.set_value_from_str(value_str)
-                self.param_changed(param)
+                param = self.set_param_from_line(line)
+                if param is not None:
+                    changed.add(param.name)
         except EOFError:
-            print('Error [ckb-python]: Reached EOF reading parameters')
+            print('Error [ckb-python]: Reached EOF reading parameters',
+                  file=self.stdout)
             exit(-2)
 
-    def read_key(self, line):
-        match = re.search(r'^key (?:(\d+),(\d+)|(\w+)) (down|up)', line)
-        if match is None:
+        if changed:
+            self.pending_param_changes |= changed
+            self.params_changed(changed)
+
+    def set_param_from_line(self, line):
+        """Applies a 'param' line, returning the param if its value changed
+        or None otherwise."""
+        parsed = parse_param(line)
+        if parsed is None:
+            return None
+
+        param_name, value_str = parsed
+        param = self.params.get(param_name, None)
+        if param is None or self.param_strings.get(param_name) == value_str:
+            return None
+
+        param.set_value_from_str(value_str)
+        self.param_strings[param_name] = value_str
+        return param
+
+    def read_key(self, args):
+        event = self.find_key(args)
+        if event is None:
             return
+        if self.key_events is not None:
+            key, state = event
+            self.key_events.push(self.current_time, key.index, state)
+        else:
+            self.keypress(*event)
+
+    def find_key(self, args):
+        """Parses a key event into a (key, state) tuple or None."""
+        event = parse_key_event(args)
+        if event is None:
+            return None
 
-        key = None
-        if match.group(1):
-            x = int(match.group(1))
-            y = int(match.group(2))
-            key = next((k for _, k in self.keys
-                        if k.x == x and k.y == y),
-                       None)
+        name, x, y, state = event
+        if name is None:
+            key = self.key_index.key_at(x, y)
         else:
-            name = match.group(3)
             key = self.keys.get(name, None)
 
-        if key is not None:
-            state = match.group(4) == 'down'
-            self.keypress(key, state)
+        if key is None:
+            return None
+        return key, state
+
+    def key_at(self, x, y):
+        """Returns the key at exactly the given position or None."""
+        return self.key_index.key_at(x, y)
+
+    def nearest_key(self, x, y, max_distance=None):
+        """Returns the key closest to the given position or None."""
+        return self.key_index.nearest(x, y, max_distance)
+
+    def keys_within(self, x, y, radius):
+        """Returns all keys within the given distance of a position."""
+        return self.key_index.keys_within(x, y, radius)
 
     def print_frame(self):
+        worker = self.render_worker
+        if worker is None:
+            self.render()
+            self.write_frame()
+            return
+
+        # Send the frame rendered in the background and start the next one
+        worker.wait_for_frame()
+        with worker.lock:
+            self.write_frame(worker.colors, worker.dirty)
+        worker.request_frame()
+
+    def render(self):
+        """Rebuilds state derived from changed params, if any, and updates
+        the frame buffer."""
+        events = self.prepare_render()
+        if events:
+            self.keypresses(events)
+            events.clear()
         self.update_colors()
-        print('begin frame')
-        for key_name, key in self.keys.items():
-            print(f'argb {key_name} {key.color}')
-        print('end frame')
+
+    def prepare_render(self):
+        """Applies pending param changes; returns the queued key events to
+        pass to keypresses(), if any."""
+        if self.pending_param_changes:
+            changed = self.pending_param_changes
+            self.pending_param_changes = set()
+            self.rebuild(changed)
+            if self.parallel is not None:
+                self.parallel.update_params(self.params)
+        events = self.key_events
+        if events is not None and len(events):
+            return events
+        return None
+
+    def render_parallel(self, time):
+        """Renders the frame for a time with the parallel renderer; meant
+        to be called from update_colors()."""
+        self.parallel.render(time, self.frame_buffer)
+
+    def write_frame(self, colors=None, dirty=None):
+        """Sends colors (by default the frame buffer's) to ckb."""
+        if colors is None:
+            colors = self.frame_buffer.colors
+            dirty = self.frame_buffer.dirty
+        shared = self.shared_frame_writer
+        if self.full_frame_pending:
+            self.frame_writer.write(colors)
+            if shared is not None:
+                shared.write(colors)
+        else:
+            if self.delta_frames:
+                self.frame_writer.write_keys(colors, dirty)
+            else:
+                self.frame_writer.write(colors)
+            if shared is not None:
+                shared.write_keys(colors, dirty)
+        dirty.clear()
+        self.full_frame_pending = False
+
+    def open_shared_frames(self):
+        """Starts publishing frames in the shared_frames file, if set."""
+        if self.shared_frames is not None:
+            from .shm import SharedFrameWriter
+            self.shared_frame_writer = SharedFrameWriter(
+                process_path(self.shared_frames), self.frame_buffer.names)
+
+    def close_shared_frames(self):
+        if self.shared_frame_writer is not None:
+            self.shared_frame_writer.close()
+            self.shared_frame_writer = None
+
+    def mark_dirty(self, key):
+        """Marks a key whose color was changed behind the frame buffer's
+        back (e.g. through a NumPy view) for the next frame."""
+        self.frame_buffer.dirty.add(key.index)
+
+    def request_full_frame(self):
+        """Makes the next frame include every key, changed or not."""
+        self.full_frame_pending = True
+
+    def params_changed(self, names):
+        """Called once per params block with the names of changed params.
+
+        Expensive state derived from params should rather be rebuilt in
+        rebuild(), which runs once before the next frame.
+        """
+        for name in names:
+            self.param_changed(self.params[name])
+
+    def rebuild(self, names): pass
 
     def param_changed(self, param): pass
 
+    def keypresses(self, events):
+        """Called before rendering a frame with the KeyEventQueue of the key
+        events since the last frame, if batch_keys is set.
+
+        By default, keypress() is called for each event.
+        """
+        names = self.frame_buffer.names
+        for _, index, state in events:
+            self.keypress(self.keys[names[index]], state)
+
     def keypress(self, key, state): pass
 
     def advance_time(self, delta_t): pass
@@ -0,0 +1,83 @@
+import math
+from array import array
+
+
+class KeyEventQueue(object):
+    """Ring buffer of key events stored in (time, key index, state) columns.
+
+    Events are meant to be consumed once per frame; if more than capacity
+    events arrive in between, the oldest ones are dropped. The queue also
+    keeps a press rate per key: presses per second, decaying exponentially
+    with the given half-life, e.g. for heatmap effects.
+    """
+
+    def __init__(self, key_count, capacity=256, half_life=2.0):
+        self.capacity = capacity
+        self.times = array('d', [0.0]) * capacity
+        self.indices = array('i', [0]) * capacity
+        self.states = array('b', [0]) * capacity
+        self.start = 0
+        self.count = 0
+        self.dropped = 0
+
+        self.decay = math.log(2) / half_life
+        self.press_counts = array('L', [0]) * key_count
+        # Rate of each key as of its last press
+        self._rates = array('d', [0.0]) * key_count
+        self._last_press = array('d', [0.0]) * key_count
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        """Yields the queued (time, key index, state) events, oldest first."""
+        capacity = self.capacity
+        for i in range(self.start, self.start + self.count):
+            i %= capacity
+            yield self.times[i], self.indices[i], bool(self.states[i])
+
+    def push(self, time, index, state):
+        """Queues an event and updates the key's press statistics."""
+        if self.count == self.capacity:
+            self.start = (self.start + 1) % self.capacity
+            self.count -= 1
+            self.dropped += 1
+        i = (self.start + self.count) % self.capacity
+        self.times[i] = time
+        self.indices[i] = index
+        self.states[i] = state
+        self.count += 1
+
+        if state:
+            self.press_counts[index] += 1
+            elapsed = time - self._last_press[index]
+            self._rates[index] = (self._rates[index] *
+                                  math.exp(-self.decay * max(0.0, elapsed)) +
+                                  self.decay)
+            self._last_press[index] = time
+
+    def clear(self):
+        self.start = 0
+        self.count = 0
+
+    def columns(self):
+        """Returns copies of the queued events' times, key indices and states
+        as arrays in order, e.g. to wrap with numpy.frombuffer."""
+        start = self.start
+        end = start + self.count
+        columns = []
+        for column in (self.times, self.indices, self.states):
+            if end <= self.capacity:
+                columns.append(column[start:end])
+            else:
+                columns.append(column[start:] + column[:end - self.capacity])
+        return tuple(columns)
+
+    def press_rates(self, time):
+        """Returns every key's press rate at the given time as a NumPy
+        array."""
+        import numpy
+        rates = numpy.frombuffer(self._rates, dtype=numpy.float64)
+        last = numpy.frombuffer(self._last_press, dtype=numpy.float64)
+        elapsed = numpy.maximum(time - last, 0.0)
+        return rates * numpy.exp(-self.decay * elapsed)
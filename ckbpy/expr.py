@@ -0,0 +1,249 @@
+import ast
+import math
+from .effect import Effect
+from .constants import Time
+
+# Per-key variables, taken from the keymap's KeyGeometry
+KEY_VARIABLES = {
+    'x': 'x', 'y': 'y', 'nx': 'nx', 'ny': 'ny', 'dx': 'dx', 'dy': 'dy',
+    'distance': 'distance', 'ndistance': 'normalized_distance',
+    'angle': 'angle',
+}
+TIME_VARIABLE = 't'
+CONSTANTS = {'pi': math.pi, 'e': math.e}
+FUNCTIONS = (
+    'sin', 'cos', 'tan', 'arcsin', 'arccos', 'arctan', 'arctan2', 'hypot',
+    'sqrt', 'exp', 'log', 'abs', 'sign', 'floor', 'ceil', 'fmod', 'minimum',
+    'maximum', 'clip', 'where', 'radians', 'degrees', 'fract',
+)
+
+_OPERATORS = (
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+)
+
+# Kinds of subexpressions, by what they depend on
+_CONSTANT = 0
+_KEYS = 1
+_TIME = 2
+
+
+def _functions():
+    import numpy
+    functions = dict((name, getattr(numpy, name)) for name in FUNCTIONS
+                     if hasattr(numpy, name))
+    functions['fract'] = lambda value: numpy.mod(value, 1.0)
+    return functions
+
+
+def parse_formula(formula, param_names=()):
+    """Parses a formula, raising a ValueError if it isn't a plain arithmetic
+    expression over known names."""
+    try:
+        tree = ast.parse(formula.strip(), '<formula>', 'eval')
+    except SyntaxError as e:
+        raise ValueError(f'Invalid formula "{formula}": {e.msg}') from None
+
+    names = (set(KEY_VARIABLES) | set(CONSTANTS) | set(param_names) |
+             {TIME_VARIABLE})
+    # Function names may only be called, not used as values
+    called = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            if (not isinstance(node.func, ast.Name) or
+                    node.func.id not in FUNCTIONS or node.keywords):
+                raise ValueError(f'Unsupported call in formula "{formula}"')
+            called.add(id(node.func))
+        elif isinstance(node, ast.Name):
+            if node.id in FUNCTIONS and id(node) not in called:
+                raise ValueError(f'Function "{node.id}" used without being '
+                                 f'called in formula')
+            if node.id not in names and node.id not in FUNCTIONS:
+                raise ValueError(f'Unknown name "{node.id}" in formula')
+        elif isinstance(node, ast.Compare):
+            if len(node.ops) != 1:
+                raise ValueError('Chained comparisons are not supported')
+        elif isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float)):
+                raise ValueError(f'Unsupported constant in formula '
+                                 f'"{formula}"')
+        elif not isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp,
+                                   ast.Load) + _OPERATORS):
+            raise ValueError(f'Unsupported syntax in formula "{formula}": '
+                             f'{type(node).__name__}')
+    return tree
+
+
+def _operands(node):
+    """Returns (container, key) pairs locating the operands of a node."""
+    if isinstance(node, ast.BinOp):
+        return [(node, 'left'), (node, 'right')]
+    if isinstance(node, ast.UnaryOp):
+        return [(node, 'operand')]
+    if isinstance(node, ast.Compare):
+        return [(node, 'left'), (node.comparators, 0)]
+    return [(node.args, i) for i in range(len(node.args))]
+
+
+def _get(container, key):
+    if isinstance(key, int):
+        return container[key]
+    return getattr(container, key)
+
+
+def _set(container, key, value):
+    if isinstance(key, int):
+        container[key] = value
+    else:
+        setattr(container, key, value)
+
+
+class FormulaKernel(object):
+    """A formula compiled for one keymap and set of param values.
+
+    Subexpressions not depending on the time are computed once when
+    compiling: constant ones (including param values) fold into numbers,
+    ones depending only on the keys into arrays. Evaluating the kernel then
+    only runs the array operations involving t.
+    """
+
+    def __init__(self, tree, values, geometry):
+        import numpy
+        self.size = len(geometry)
+        self.namespace = dict(_functions())
+        self.values = dict((name, numpy.float64(value))
+                           for name, value in values.items())
+        self.values.update(CONSTANTS)
+        self.keys = dict((name, getattr(geometry, attribute))
+                         for name, attribute in KEY_VARIABLES.items())
+        self.namespace.update(self.keys)
+        self._stored = 0
+
+        with numpy.errstate(all='ignore'):
+            body, kind = self._fold(tree.body)
+            if kind != _TIME:
+                # Doesn't depend on time at all: compute the phases once
+                body = self._store(self._evaluate(body))
+        self.time_dependent = kind == _TIME
+        expression = ast.fix_missing_locations(ast.Expression(body))
+        self.code = compile(expression, '<formula>', 'eval')
+
+    def _store(self, value):
+        name = f'_v{self._stored}'
+        self._stored += 1
+        self.namespace[name] = value
+        return ast.Name(name, ast.Load())
+
+    def _evaluate(self, node):
+        expression = ast.fix_missing_locations(ast.Expression(node))
+        return eval(compile(expression, '<formula>', 'eval'),
+                    {'__builtins__': {}}, self.namespace)
+
+    def _fold(self, node):
+        """Returns the node with precomputable parts replaced by their
+        values and what it depends on."""
+        if isinstance(node, ast.Constant):
+            return node, _CONSTANT
+        if isinstance(node, ast.Name):
+            if node.id in self.values:
+                return self._store(self.values[node.id]), _CONSTANT
+            if node.id in self.keys:
+                return node, _KEYS
+            return node, _TIME
+
+        operands = _operands(node)
+        kinds = []
+        for container, key in operands:
+            operand, kind = self._fold(_get(container, key))
+            _set(container, key, operand)
+            kinds.append(kind)
+
+        kind = max(kinds, default=_CONSTANT)
+        if kind == _CONSTANT:
+            return self._store(self._evaluate(node)), _CONSTANT
+        if kind == _TIME:
+            # Precompute the key-only operands of time-dependent operations
+            for (container, key), operand_kind in zip(operands, kinds):
+                operand = _get(container, key)
+                if operand_kind == _KEYS and not isinstance(operand, ast.Name):
+                    _set(container, key, self._store(self._evaluate(operand)))
+        return node, kind
+
+    def evaluate(self, time):
+        """Returns the formula's value for every key at the given time."""
+        import numpy
+        self.namespace[TIME_VARIABLE] = time
+        with numpy.errstate(all='ignore'):
+            value = eval(self.code, {'__builtins__': {}}, self.namespace)
+        value = numpy.broadcast_to(numpy.asarray(value, dtype=float),
+                                   (self.size,))
+        return numpy.nan_to_num(value, nan=0.0)
+
+
+class FormulaEffect(Effect):
+    """Effect coloring each key from a gradient at the phase given by a
+    formula, e.g. 'fract(nx + t * speed)'.
+
+    The formula is a Python arithmetic expression over the key variables in
+    KEY_VARIABLES (nx/ny span [0.0,1.0] across the keyboard, angle is in
+    degrees), the time t in seconds, numeric params by name and the NumPy
+    functions in FUNCTIONS. It is compiled into a FormulaKernel once per
+    keymap and whenever a param it uses changes, so a frame costs a few
+    array operations no matter how many keys there are. Phases outside
+    [0.0,1.0] are clamped by the gradient.
+    """
+
+    def __init__(self, formula, *args, gradient='gradient', **kwargs):
+        super().__init__(*args, **kwargs)
+        if gradient not in self.params:
+            raise ValueError(f'No gradient param "{gradient}"')
+        self.formula = formula
+        self.gradient = gradient
+        numeric = set(name for name, param in self.params.items()
+                      if isinstance(getattr(param, 'value', None),
+                                    (int, float)))
+        self.tree = parse_formula(formula, numeric)
+        # Params the formula depends on
+        self.formula_params = set(
+            node.id for node in ast.walk(self.tree)
+            if isinstance(node, ast.Name) and node.id in numeric)
+        self.kernel = None
+        self.elapsed = 0.0
+
+    def build_keymap(self, entries):
+        keys = super().build_keymap(entries)
+        self.kernel = None
+        return keys
+
+    def rebuild(self, names):
+        if names & self.formula_params:
+            self.kernel = None
+
+    def compile_formula(self):
+        import copy
+        values = dict((name, self.params[name].value)
+                      for name in self.formula_params)
+        return FormulaKernel(copy.deepcopy(self.tree), values, self.geometry)
+
+    def advance_time(self, delta_t):
+        if self.time == Time.ABSOLUTE and self.clock is None:
+            self.elapsed = delta_t
+        else:
+            self.elapsed += delta_t
+
+    def update_colors(self):
+        import numpy
+        if self.kernel is None:
+            self.kernel = self.compile_formula()
+        time = self.elapsed
+        if self.clock is not None:
+            time += self.clock.alpha * self.clock.step
+
+        phases = self.kernel.evaluate(time)
+        packed = self.params[self.gradient].get_colors_for_phases(phases)
+        frame_buffer = self.frame_buffer
+        colors = frame_buffer.as_numpy()
+        changed = numpy.flatnonzero(colors != packed)
+        if len(changed):
+            colors[changed] = packed[changed]
+            frame_buffer.dirty.update(changed.tolist())
@@ -0,0 +1,60 @@
+import sys
+from array import array
+from binascii import hexlify
+
+
+class FrameWriter(object):
+    """Writes whole frames to ckb with a single write and flush.
+
+    The complete 'begin frame ... end frame' block is laid out once for the
+    keymap; per frame only the color digits of each key are overwritten.
+    """
+
+    def __init__(self, key_names, stream=None):
+        if stream is None:
+            stream = sys.stdout
+        # Frames are written as raw bytes, bypassing the text layer.
+        self.stream = getattr(stream, 'buffer', stream)
+        self.offsets = []
+        self.lines = []
+
+        frame = bytearray(b'begin frame\n')
+        for name in key_names:
+            line_start = len(frame)
+            frame += b'argb ' + name.encode() + b' '
+            self.offsets.append(len(frame))
+            frame += b'00000000\n'
+            self.lines.append((line_start, len(frame)))
+        frame += b'end frame\n'
+        self.frame = frame
+
+    def set_colors(self, colors):
+        """Copies all packed ARGB colors into the frame."""
+        packed = array('I', colors)
+        if sys.byteorder == 'little':
+            packed.byteswap()
+        digits = hexlify(packed)
+        frame = self.frame
+        for i, offset in enumerate(self.offsets):
+            frame[offset:offset + 8] = digits[i * 8:i * 8 + 8]
+
+    def write(self, colors):
+        """Sends a frame containing every key to ckb."""
+        self.set_colors(colors)
+        self.stream.write(self.frame)
+        self.stream.flush()
+
+    def write_keys(self, colors, indices):
+        """Sends a frame containing only the keys at the given indices."""
+        frame = self.frame
+        offsets = self.offsets
+        lines = self.lines
+        parts = [b'begin frame\n']
+        for i in sorted(indices):
+            offset = offsets[i]
+            frame[offset:offset + 8] = b'%08x' % colors[i]
+            start, end = lines[i]
+            parts.append(frame[start:end])
+        parts.append(b'end frame\n')
+        self.stream.write(b''.join(parts))
+        self.stream.flush()
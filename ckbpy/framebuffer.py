@@ -0,0 +1,108 @@
+from array import array
+
+
+def pack_color(color):
+    """Packs a color object into a 0xAARRGGBB integer."""
+    if isinstance(color, int):
+        return color
+    return color.packed
+
+
+class ColorView(object):
+    """ARGB color stored in a FrameBuffer instead of its own attributes."""
+
+    __slots__ = ('frame_buffer', 'index')
+
+    def __init__(self, frame_buffer, index):
+        self.frame_buffer = frame_buffer
+        self.index = index
+
+    @property
+    def packed(self):
+        return self.frame_buffer.colors[self.index]
+
+    @packed.setter
+    def packed(self, value):
+        self.frame_buffer.set(self.index, value)
+
+    def _set_channel(self, shift, value):
+        packed = self.packed & ~(0xff << shift)
+        self.packed = packed | ((value & 0xff) << shift)
+
+    @property
+    def a(self):
+        return self.packed >> 24
+
+    @a.setter
+    def a(self, value):
+        self._set_channel(24, value)
+
+    @property
+    def r(self):
+        return (self.packed >> 16) & 0xff
+
+    @r.setter
+    def r(self, value):
+        self._set_channel(16, value)
+
+    @property
+    def g(self):
+        return (self.packed >> 8) & 0xff
+
+    @g.setter
+    def g(self, value):
+        self._set_channel(8, value)
+
+    @property
+    def b(self):
+        return self.packed & 0xff
+
+    @b.setter
+    def b(self, value):
+        self._set_channel(0, value)
+
+    @property
+    def argb(self):
+        packed = self.packed
+        return (packed >> 24, (packed >> 16) & 0xff,
+                (packed >> 8) & 0xff, packed & 0xff)
+
+    @argb.setter
+    def argb(self, value):
+        self.packed = ((value[0] << 24) | (value[1] << 16) |
+                       (value[2] << 8) | value[3])
+
+    def __str__(self):
+        return f'{self.packed:08x}'
+
+
+class FrameBuffer(object):
+    """Packed ARGB colors of all keys, indexed in keymap order."""
+
+    def __init__(self, key_names):
+        self.names = list(key_names)
+        self.index = dict((name, i) for i, name in enumerate(self.names))
+        self.colors = array('I', bytes(4 * len(self.names)))
+        # Indices of keys that changed since the last frame
+        self.dirty = set()
+
+    def __len__(self):
+        return len(self.colors)
+
+    def set(self, index, color):
+        """Sets the color of the key at the given index."""
+        self.colors[index] = pack_color(color)
+        self.dirty.add(index)
+
+    def get(self, index):
+        """Returns the packed color of the key at the given index."""
+        return self.colors[index]
+
+    def mark_all_dirty(self):
+        """Marks every key as changed, e.g. after writing to as_numpy()."""
+        self.dirty.update(range(len(self.colors)))
+
+    def as_numpy(self):
+        """Returns a writable uint32 NumPy view of the packed colors."""
+        import numpy
+        return numpy.frombuffer(self.colors, dtype=numpy.uint32)
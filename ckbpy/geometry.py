@@ -0,0 +1,52 @@
+class KeyGeometry(object):
+    """The keymap's coordinates as NumPy arrays in frame buffer order.
+
+    Angles follow ckb's angle param: degrees clockwise from pointing up, with
+    y growing downwards as in the keymap.
+    """
+
+    def __init__(self, keys):
+        import numpy
+        keys = sorted(keys, key=lambda k: k.index)
+        self.x = numpy.array([k.x for k in keys], dtype=float)
+        self.y = numpy.array([k.y for k in keys], dtype=float)
+
+        if len(keys) == 0:
+            self.min_x = self.max_x = self.min_y = self.max_y = 0.0
+        else:
+            self.min_x, self.max_x = self.x.min(), self.x.max()
+            self.min_y, self.max_y = self.y.min(), self.y.max()
+        self.width = self.max_x - self.min_x
+        self.height = self.max_y - self.min_y
+        self.center = ((self.min_x + self.max_x) / 2,
+                       (self.min_y + self.max_y) / 2)
+
+        # Coordinates scaled to [0.0,1.0] across the keyboard
+        self.nx = (self.x - self.min_x) / (self.width or 1.0)
+        self.ny = (self.y - self.min_y) / (self.height or 1.0)
+
+        # Polar coordinates around the keyboard's center
+        self.dx = self.x - self.center[0]
+        self.dy = self.y - self.center[1]
+        self.distance = numpy.hypot(self.dx, self.dy)
+        max_distance = self.distance.max() if len(keys) else 0.0
+        self.normalized_distance = self.distance / (max_distance or 1.0)
+        self.angle = numpy.degrees(numpy.arctan2(self.dx, -self.dy)) % 360
+
+    def __len__(self):
+        return len(self.x)
+
+    def distance_from(self, x, y):
+        """Returns every key's distance to a point."""
+        import numpy
+        return numpy.hypot(self.x - x, self.y - y)
+
+    def project(self, angle):
+        """Returns every key's position in [0.0,1.0] along the direction of
+        an angle in degrees, e.g. for waves travelling in that direction."""
+        import numpy
+        radians = numpy.radians(angle)
+        position = self.dx * numpy.sin(radians) - self.dy * numpy.cos(radians)
+        low = position.min() if len(position) else 0.0
+        span = (position.max() - low) if len(position) else 0.0
+        return (position - low) / (span or 1.0)
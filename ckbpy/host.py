@@ -0,0 +1,360 @@
+import io
+import os
+import sys
+import time
+import fcntl
+import socket
+import struct
+import logging
+import threading
+from .constants import Time
+from .effect import process_path
+
+# Sent by the host once it accepted a session
+ACK = b'\x06'
+
+
+def default_socket_path(factory):
+    """Returns the host socket of an effect class, unique per user."""
+    from hashlib import sha1
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+    # Effects started by ckb are usually scripts, all named __main__
+    module = sys.modules.get(factory.__module__)
+    source = getattr(module, '__file__', None)
+    if source is not None:
+        source = os.path.abspath(source)
+    else:
+        source = factory.__module__
+    name = f'{source}:{factory.__qualname__}:{os.getuid()}'
+    return os.path.join(runtime_dir,
+                        f'ckbpy-{sha1(name.encode()).hexdigest()[:16]}.sock')
+
+
+class _Session(object):
+    def __init__(self, effect, base_time, process_id):
+        self.effect = effect
+        # Replaces {pid} in the session's file paths
+        self.process_id = process_id
+        # Shared clock time at which the session joined
+        self.base_time = base_time
+        self.elapsed = 0.0
+        # Shared clock time the effect has been advanced to
+        self.time = base_time
+        self.params_changed = effect.params_changed
+
+
+class EffectHost(object):
+    """Serves several ckb sessions (one per device) from one process.
+
+    Each session gets its own effect from factory with its own keymap and
+    frame buffer, but all of them share their Param objects (and with them
+    e.g. gradient lookup tables), the raw param values received from ckb
+    and a clock: a session's time runs from the shared time it joined at,
+    and every effect is advanced to the latest time any session reached so
+    devices stay in sync. Changing params in one session notifies all of
+    them. Sessions run in their own threads, but their commands are handled
+    one at a time under the host's lock.
+
+    Like run(), sessions apply the CKBPY_STATS, CKBPY_SHARED_FRAMES and
+    CKBPY_RECORD settings of the host's environment (which the host daemon
+    inherits from the effect process that started it). {pid} in their paths
+    is the pid of the session's own effect process, so devices don't share
+    a file.
+
+    Only synchronous effects can be hosted.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.lock = threading.RLock()
+        self.params = {}
+        self.param_strings = {}
+        self.clock = 0.0
+        self.sessions = []
+        self.session_count = 0
+        # Effect-defined state to be shared between the sessions
+        self.shared = {}
+        self.closing = False
+
+    def create_session(self, process_id=None):
+        """Creates an effect sharing the host's state, or None once the host
+        is shutting down. process_id identifies the session in file paths;
+        by default it is the host's pid and the session's number."""
+        with self.lock:
+            if self.closing:
+                return None
+            self.session_count += 1
+            if process_id is None:
+                process_id = f'{os.getpid()}-{self.session_count}'
+            effect = self.factory()
+            effect.host = self
+            for name, param in list(effect.params.items()):
+                effect.params[name] = self.params.setdefault(name, param)
+            effect.param_strings = self.param_strings
+            session = _Session(effect, self.clock, process_id)
+            self.sessions.append(session)
+            self._wrap(session)
+
+            # The params may already have been set by another session
+            known = set(self.param_strings) & set(effect.params)
+            if known:
+                effect.pending_param_changes |= known
+                session.params_changed(known)
+            return session
+
+    def end_session(self, session):
+        with self.lock:
+            self.sessions.remove(session)
+
+    def _wrap(self, session):
+        effect = session.effect
+        lock = self.lock
+        handlers = effect.command_handlers
+        set_param_from_line = effect.set_param_from_line
+        handle_time = effect.handle_time
+        absolute_time = effect.time == Time.ABSOLUTE
+
+        def locked(handler):
+            def locked_handler(args):
+                with lock:
+                    handler(args)
+            return locked_handler
+
+        def command_handlers():
+            # 'begin params' reads from the session's pipe, so only the
+            # param changes themselves are locked
+            return dict((command, handler if command == 'begin'
+                         else locked(handler))
+                        for command, handler in handlers().items())
+
+        def locked_set_param_from_line(line):
+            with lock:
+                return set_param_from_line(line)
+
+        def params_changed(names):
+            with lock:
+                for other in self.sessions:
+                    if other is not session:
+                        other_names = set(n for n in names
+                                          if n in other.effect.params)
+                        other.effect.pending_param_changes |= other_names
+                        other.params_changed(other_names)
+                session.params_changed(names)
+
+        def shared_handle_time(args):
+            if absolute_time:
+                # Absolute times are the same for every device already
+                handle_time(args)
+                return
+            session.elapsed += float(args)
+            self.clock = max(self.clock, session.base_time + session.elapsed)
+            delta_t = self.clock - session.time
+            session.time = self.clock
+            handle_time(repr(delta_t))
+
+        effect.command_handlers = command_handlers
+        effect.set_param_from_line = locked_set_param_from_line
+        effect.params_changed = params_changed
+        effect.handle_time = shared_handle_time
+
+    def serve(self, session, stdin, stdout):
+        """Runs a session's effect on the given streams."""
+        effect = session.effect
+        try:
+            record = effect.apply_environment()
+            if effect.shared_frames is not None:
+                effect.shared_frames = process_path(effect.shared_frames,
+                                                    session.process_id)
+            if record:
+                effect.main_recorded(process_path(record, session.process_id),
+                                     stdin, stdout)
+            else:
+                effect.main(stdin, stdout)
+        except Exception:
+            logging.exception('An unexpected exception occurred')
+        finally:
+            self.end_session(session)
+
+
+class _Server(object):
+    """Accepts sessions from ckb's effect processes on a Unix socket."""
+
+    def __init__(self, host, path, listener, lock_file, linger=1.0):
+        self.host = host
+        self.path = path
+        self.listener = listener
+        self.lock_file = lock_file
+        # Seconds to wait for new sessions once the last one ended
+        self.linger = linger
+
+    def serve_forever(self):
+        host = self.host
+        self.listener.settimeout(self.linger)
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except socket.timeout:
+                with host.lock:
+                    if host.sessions:
+                        continue
+                    host.closing = True
+                break
+            conn.settimeout(None)
+            session = host.create_session(_peer_pid(conn))
+            if session is None:
+                conn.close()
+                continue
+            conn.sendall(ACK)
+            threading.Thread(target=self.serve, args=(session, conn),
+                             daemon=True, name='ckbpy-session').start()
+        self.close()
+
+    def serve(self, session, conn):
+        stdin = conn.makefile('r')
+        stdout = io.TextIOWrapper(conn.makefile('wb'), write_through=True)
+        try:
+            self.host.serve(session, stdin, stdout)
+        finally:
+            for f in (stdin, stdout, conn):
+                try:
+                    f.close()
+                except OSError:
+                    pass
+
+    def close(self):
+        # Unlink before releasing the lock so new processes elect a new host
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        self.listener.close()
+        self.lock_file.close()
+
+
+def _peer_pid(conn):
+    """Returns the pid of the process at the other end of a Unix socket, or
+    None where that isn't available."""
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    credentials = struct.Struct('3i')
+    try:
+        data = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+                               credentials.size)
+    except OSError:
+        return None
+    return credentials.unpack(data)[0]
+
+
+def _connect(path):
+    """Connects to the host at path and waits for it to accept the session,
+    returning the socket or None."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+        if client.recv(1) == ACK:
+            return client
+    except OSError:
+        pass
+    client.close()
+    return None
+
+
+def _listen(path):
+    """Becomes the host at path, returning the listening socket and the
+    held lock file, or (None, None) if another process is the host."""
+    lock_file = open(f'{path}.lock', 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None, None
+    # Holding the lock, any socket file left is stale
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+    return listener, lock_file
+
+
+def _spawn_host(factory, path):
+    """Starts a host daemon for factory's effect unless there is one."""
+    listener, lock_file = _listen(path)
+    if listener is None:
+        return
+    pid = os.fork()
+    if pid != 0:
+        # The daemon keeps the socket and the lock
+        listener.close()
+        lock_file.close()
+        os.waitpid(pid, 0)
+        return
+
+    # Detach from ckb, which must only see the client holding its pipes
+    os.setsid()
+    if os.fork() != 0:
+        os._exit(0)
+    null = os.open(os.devnull, os.O_RDWR)
+    os.dup2(null, 0)
+    os.dup2(null, 1)
+    os.close(null)
+    try:
+        _Server(EffectHost(factory), path, listener, lock_file).serve_forever()
+    except Exception:
+        logging.exception('The effect host failed')
+    finally:
+        os._exit(0)
+
+
+def _pump_input(client):
+    fd = sys.stdin.fileno()
+    try:
+        while True:
+            data = os.read(fd, 65536)
+            if not data:
+                break
+            client.sendall(data)
+        client.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+
+
+def run_client(client):
+    """Relays stdin and stdout between ckb and the host."""
+    threading.Thread(target=_pump_input, args=(client,), daemon=True,
+                     name='ckbpy-client').start()
+    stdout = sys.stdout.buffer
+    try:
+        while True:
+            data = client.recv(65536)
+            if not data:
+                break
+            stdout.write(data)
+            stdout.flush()
+    finally:
+        client.close()
+
+
+def run_hosted(factory, path=None):
+    """Hands ckb's session to the host process of factory's effect.
+
+    The host is started as a daemon by the first effect process and exits
+    once its last session has ended; every process started by ckb only
+    relays its stdin and stdout, so stopping one of them ends just its own
+    session.
+    """
+    if path is None:
+        path = default_socket_path(factory)
+    while True:
+        client = _connect(path)
+        if client is not None:
+            break
+        _spawn_host(factory, path)
+        client = _connect(path)
+        if client is not None:
+            break
+        # Another process is just starting or stopping the host
+        time.sleep(0.01)
+    run_client(client)
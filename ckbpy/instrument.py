@@ -0,0 +1,218 @@
+import json
+import time
+import inspect
+import socket
+import logging
+from collections import deque
+
+# Effect methods timed in addition to the dispatched commands
+METHODS = ('update_colors', 'write_frame', 'advance_time')
+
+
+class RollingHistogram(object):
+    """Keeps the most recent durations (in ns) of a phase."""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0
+
+    def add(self, duration):
+        self.samples.append(duration)
+        self.count += 1
+        self.total += duration
+
+    def percentile(self, p):
+        if not self.samples:
+            return 0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total / 1e6,
+            'p50_ms': self.percentile(50) / 1e6,
+            'p99_ms': self.percentile(99) / 1e6,
+            'max_ms': max(self.samples, default=0) / 1e6,
+        }
+
+
+class Instrumentation(object):
+    """Per-phase timing of an effect's main loop.
+
+    Every dispatched command and the methods in METHODS are timed with
+    time.perf_counter_ns and kept in rolling histograms. Every report_every
+    frames, stats() is passed to the sink, any callable taking a dict. When
+    an effect has no instrumentation, none of this code is on its path.
+    Coroutine functions, e.g. an AsyncEffect's hooks, are timed until they
+    return, including the time spent awaiting.
+    """
+
+    def __init__(self, sink=None, window=600, report_every=600,
+                 frame_budget=1 / 60):
+        self.sink = sink if sink is not None else log_sink
+        self.window = window
+        self.report_every = report_every
+        self.frame_budget_ns = int(frame_budget * 1e9)
+        self.phases = {}
+        self.frames = 0
+        self.late_frames = 0
+        self.dropped_frames = 0
+        self.coalesced_times = 0
+        self._last_frame = None
+        self._intervals = RollingHistogram(window)
+        self._replaced = {}
+
+    @staticmethod
+    def from_spec(spec):
+        """Creates instrumentation from a sink spec: 'log', 'unix:<path>' or
+        the path of a file to append JSON lines to."""
+        if spec == 'log':
+            return Instrumentation(log_sink)
+        if spec.startswith('unix:'):
+            return Instrumentation(UnixSocketSink(spec[len('unix:'):]))
+        return Instrumentation(FileSink(spec))
+
+    def phase(self, name):
+        histogram = self.phases.get(name)
+        if histogram is None:
+            histogram = self.phases[name] = RollingHistogram(self.window)
+        return histogram
+
+    def timed(self, name, function):
+        """Wraps a function so its duration is recorded as a phase."""
+        add = self.phase(name).add
+        clock = time.perf_counter_ns
+
+        if inspect.iscoroutinefunction(function):
+            async def timed_coroutine(*args):
+                start = clock()
+                try:
+                    return await function(*args)
+                finally:
+                    add(clock() - start)
+            return timed_coroutine
+
+        def timed_function(*args):
+            start = clock()
+            try:
+                return function(*args)
+            finally:
+                add(clock() - start)
+        return timed_function
+
+    def timed_frame(self, handler):
+        """Wraps the frame handler, additionally tracking frame intervals."""
+        timed_handler = self.timed('frame', handler)
+        clock = time.perf_counter_ns
+
+        def begin_frame():
+            start = clock()
+            if self._last_frame is not None:
+                self._intervals.add(start - self._last_frame)
+            self._last_frame = start
+            return start
+
+        def end_frame(start):
+            if clock() - start > self.frame_budget_ns:
+                self.late_frames += 1
+            self.frames += 1
+            if self.frames % self.report_every == 0:
+                self.report()
+
+        if inspect.iscoroutinefunction(handler):
+            async def async_frame_handler(args):
+                start = begin_frame()
+                await timed_handler(args)
+                end_frame(start)
+            return async_frame_handler
+
+        def frame_handler(args):
+            start = begin_frame()
+            timed_handler(args)
+            end_frame(start)
+        return frame_handler
+
+    def instrument_handlers(self, handlers):
+        """Returns the command handlers wrapped with timers."""
+        instrumented = {}
+        for command, handler in handlers.items():
+            if command == 'frame':
+                instrumented[command] = self.timed_frame(handler)
+            else:
+                instrumented[command] = self.timed(command, handler)
+        return instrumented
+
+    def attach(self, effect):
+        """Times the effect's METHODS by wrapping them on the instance."""
+        # Methods already wrapped on the instance, e.g. by ckbpy.bench
+        self._replaced = dict((name, vars(effect)[name]) for name in METHODS
+                              if name in vars(effect))
+        for name in METHODS:
+            setattr(effect, name, self.timed(name, getattr(effect, name)))
+
+    def detach(self, effect):
+        """Restores the methods replaced by attach()."""
+        replaced = self._replaced
+        for name in METHODS:
+            if name in replaced:
+                setattr(effect, name, replaced[name])
+            elif name in vars(effect):
+                delattr(effect, name)
+        self._replaced = {}
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'late_frames': self.late_frames,
+            'dropped_frames': self.dropped_frames,
+            'coalesced_times': self.coalesced_times,
+            'frame_interval': self._intervals.summary(),
+            'phases': dict((name, histogram.summary())
+                           for name, histogram in self.phases.items()),
+        }
+
+    def report(self):
+        try:
+            self.sink(self.stats())
+        except Exception:
+            logging.exception('Failed to report effect statistics')
+
+
+def log_sink(stats):
+    frame = stats['phases'].get('frame')
+    if frame is None:
+        return
+    logging.info(f'{stats["frames"]} frames, '
+                 f'p50 {frame["p50_ms"]:.2f}ms, p99 {frame["p99_ms"]:.2f}ms, '
+                 f'{stats["late_frames"]} late, '
+                 f'{stats["dropped_frames"]} dropped')
+    logging.debug(json.dumps(stats))
+
+
+class FileSink(object):
+    """Appends stats as JSON lines to a file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, stats):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(stats) + '\n')
+
+
+class UnixSocketSink(object):
+    """Sends stats as JSON datagrams to a Unix socket."""
+
+    def __init__(self, path):
+        self.path = path
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+    def __call__(self, stats):
+        try:
+            self.socket.sendto(json.dumps(stats).encode(), self.path)
+        except OSError:
+            # Nobody is listening; statistics are best-effort
+            pass
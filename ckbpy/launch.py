@@ -0,0 +1,90 @@
+import os
+import sys
+
+
+def _cache_path(factory):
+    """Returns the info cache file for an effect class and the modification
+    times it is only valid for, or (None, None) if it can't be cached."""
+    if os.environ.get('CKBPY_NO_INFO_CACHE'):
+        return None, None
+    module = sys.modules.get(factory.__module__)
+    source = getattr(module, '__file__', None)
+    if source is None:
+        return None, None
+    source = os.path.abspath(source)
+    try:
+        # Info also depends on how ckbpy formats it
+        ckbpy_dir = os.path.dirname(__file__)
+        mtimes = ' '.join(str(os.stat(path).st_mtime_ns) for path in (
+            source,
+            os.path.join(ckbpy_dir, 'effect.py'),
+            os.path.join(ckbpy_dir, 'params.py'),
+            os.path.join(ckbpy_dir, 'protocol.py'),
+            os.path.join(ckbpy_dir, 'types.py')))
+    except OSError:
+        return None, None
+
+    cache_dir = os.environ.get('XDG_CACHE_HOME',
+                               os.path.join(os.path.expanduser('~'), '.cache'))
+    name = f'{source}:{factory.__qualname__}'
+    from hashlib import sha1
+    file_name = sha1(name.encode()).hexdigest() + '.info'
+    return os.path.join(cache_dir, 'ckbpy', file_name), mtimes
+
+
+def load_info(factory):
+    """Returns the cached --ckb-info output of an effect class or None."""
+    path, mtimes = _cache_path(factory)
+    if path is None:
+        return None
+    try:
+        with open(path) as f:
+            if f.readline().rstrip('\n') != mtimes:
+                return None
+            return f.read()
+    except OSError:
+        return None
+
+
+def store_info(factory, info):
+    """Caches the --ckb-info output of an effect class."""
+    path, mtimes = _cache_path(factory)
+    if path is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see partial info
+        temp_path = f'{path}.{os.getpid()}'
+        with open(temp_path, 'w') as f:
+            f.write(f'{mtimes}\n{info}')
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+
+
+def run(factory, argv=None, host=None):
+    """Runs an effect, answering --ckb-info from the cache if possible.
+
+    factory is the effect's class (or any callable creating it); it is only
+    called if the effect actually has to run or its info isn't cached yet.
+
+    With host (or the CKBPY_HOST environment variable) set, the sessions of
+    all devices are run by one shared process (see ckbpy.host); host may be
+    True or the path of the socket to use.
+    """
+    if argv is None:
+        argv = sys.argv
+    if host is None:
+        host = os.environ.get('CKBPY_HOST')
+    if host and argv[1:] == ['--ckb-run']:
+        from .host import run_hosted
+        run_hosted(factory, None if host in (True, '1') else host)
+        return
+    if argv[1:] == ['--ckb-info']:
+        info = load_info(factory)
+        if info is None:
+            info = factory().info_string()
+            store_info(factory, info)
+        sys.stdout.write(info)
+        return
+    factory().run(argv)
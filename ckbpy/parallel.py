@@ -0,0 +1,162 @@
+import os
+import pickle
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+# State of a pool worker process, set up by _init_worker
+_worker = {}
+
+
+def _attach(name):
+    try:
+        # The creating process is responsible for unlinking the memory
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        return SharedMemory(name=name)
+
+
+def _layout(memory, key_count):
+    """Returns the x, y and color arrays stored in a shared memory block."""
+    import numpy
+    x = numpy.ndarray(key_count, dtype=numpy.float64, buffer=memory.buf)
+    y = numpy.ndarray(key_count, dtype=numpy.float64, buffer=memory.buf,
+                      offset=8 * key_count)
+    colors = numpy.ndarray(key_count, dtype=numpy.uint32, buffer=memory.buf,
+                           offset=16 * key_count)
+    return x, y, colors
+
+
+def _init_worker(name, key_count, function):
+    memory = _attach(name)
+    _worker['memory'] = memory
+    _worker['arrays'] = _layout(memory, key_count)
+    _worker['function'] = function
+    _worker['params'] = (None, None)
+
+
+def _render_region(task):
+    """Renders a region, returning False if the worker didn't have the
+    task's params yet and none were sent with it."""
+    start, end, time, generation, params_data = task
+    cached_generation, params = _worker['params']
+    if cached_generation != generation:
+        if params_data is None:
+            return False
+        params = pickle.loads(params_data)
+        _worker['params'] = (generation, params)
+    x, y, colors = _worker['arrays']
+    _worker['function'](x[start:end], y[start:end], time, params,
+                        colors[start:end])
+    return True
+
+
+class ParallelRenderer(object):
+    """Renders a frame by evaluating a pure function for regions of the
+    keymap in a pool of processes, side-stepping the GIL.
+
+    function(x, y, time, params, out) gets NumPy arrays with the
+    coordinates of a region's keys and writes their packed ARGB colors to
+    the uint32 array out; params maps names to (copies of) the effect's
+    Param objects. It must be defined at module level so workers can load
+    it, and must not rely on any other state.
+
+    Key coordinates and colors live in shared memory; per frame only the
+    time and region bounds are sent to the workers. Params are pickled once
+    per change and sent with the next frame's tasks; workers keep them, and
+    regions that went to a worker which missed that frame are rendered
+    again with the params. Keymaps with fewer than min_keys keys, where
+    that costs more than it saves, are rendered in-process instead.
+    """
+
+    def __init__(self, function, processes=None, min_keys=256, regions=None):
+        self.function = function
+        self.processes = processes
+        self.min_keys = min_keys
+        # Number of regions to split the keymap into (default: 2 per process)
+        self.regions = regions
+        self.pool = None
+        self.memory = None
+        self.x = self.y = self.colors = None
+        self.bounds = []
+        self.params = {}
+        self.params_generation = 0
+        self.params_data = pickle.dumps({})
+        # Generation last sent to the pool's workers
+        self.sent_generation = None
+
+    @property
+    def parallel(self):
+        return self.pool is not None
+
+    def setup(self, geometry):
+        """Prepares rendering for a keymap's KeyGeometry."""
+        import numpy
+        self.close()
+        self.sent_generation = None
+        key_count = len(geometry)
+        if key_count < self.min_keys:
+            self.x = geometry.x
+            self.y = geometry.y
+            self.colors = numpy.zeros(key_count, dtype=numpy.uint32)
+            self.bounds = [(0, key_count)]
+            return
+
+        self.memory = SharedMemory(create=True, size=20 * key_count)
+        self.x, self.y, self.colors = _layout(self.memory, key_count)
+        self.x[:] = geometry.x
+        self.y[:] = geometry.y
+        self.colors[:] = 0
+        processes = self.processes or os.cpu_count() or 1
+        self.pool = Pool(processes, _init_worker,
+                         (self.memory.name, key_count, self.function))
+
+        # Keys come in keymap order, roughly row by row, so contiguous
+        # ranges of keys make for compact regions
+        regions = self.regions or 2 * processes
+        regions = max(1, min(regions, key_count))
+        edges = [key_count * i // regions for i in range(regions + 1)]
+        self.bounds = list(zip(edges[:-1], edges[1:]))
+
+    def update_params(self, params):
+        """Sends changed params to the workers with the next frame."""
+        self.params = params
+        self.params_generation += 1
+        self.params_data = pickle.dumps(params)
+
+    def render(self, time, frame_buffer):
+        """Renders all keys for the given time into a frame buffer, marking
+        the keys whose color changed as dirty."""
+        import numpy
+        if self.pool is None:
+            self.function(self.x, self.y, time, self.params, self.colors)
+        else:
+            generation = self.params_generation
+            params_data = (None if generation == self.sent_generation
+                           else self.params_data)
+            tasks = [(start, end, time, generation, params_data)
+                     for start, end in self.bounds]
+            rendered = self.pool.map(_render_region, tasks, chunksize=1)
+            self.sent_generation = generation
+            missed = [(start, end, time, generation, self.params_data)
+                      for (start, end, _, _, _), done in zip(tasks, rendered)
+                      if not done]
+            if missed:
+                self.pool.map(_render_region, missed, chunksize=1)
+
+        colors = frame_buffer.as_numpy()
+        changed = numpy.flatnonzero(colors != self.colors)
+        if len(changed):
+            colors[changed] = self.colors[changed]
+            frame_buffer.dirty.update(changed.tolist())
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        if self.memory is not None:
+            # Drop the views before releasing the memory they point into
+            self.x = self.y = self.colors = None
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
@@ -1,7 +1,80 @@
 from abc import ABC, abstractmethod
-from urllib.parse import quote
+from array import array
+from .protocol import quote
 from .types import (RGBColor, ARGBColor,
                     GradientColorStops, AGradientColorStops)
+from .framebuffer import FrameBuffer, pack_color
+
+
+def _sample_color_stops(color_stops, positions, opaque=False):
+    """Interpolates packed ARGB colors for an array of positions in [0,100]
+    between the given color stops. If opaque, only the RGB channels are
+    interpolated and alpha is always 0xff."""
+    import numpy
+    stop_positions = numpy.array([p for p, _ in color_stops], dtype=float)
+    packed_stops = numpy.array([pack_color(c) for _, c in color_stops],
+                               dtype=numpy.uint32)
+    if len(color_stops) == 1:
+        return numpy.full(len(positions), packed_stops[0], dtype=numpy.uint32)
+
+    # Split the stops into their channels, alpha first
+    shifts = numpy.array([24, 16, 8, 0], dtype=numpy.uint32)
+    stop_channels = ((packed_stops[:, None] >> shifts) & 0xff).astype(float)
+
+    positions = numpy.clip(positions, stop_positions[0], stop_positions[-1])
+    right = numpy.searchsorted(stop_positions, positions, side='right')
+    right = numpy.clip(right, 1, len(stop_positions) - 1)
+    left = right - 1
+
+    span = stop_positions[right] - stop_positions[left]
+    right_share = numpy.divide(positions - stop_positions[left], span,
+                               out=numpy.zeros_like(positions),
+                               where=span > 0)
+    channels = (stop_channels[left] * (1.0 - right_share)[:, None] +
+                stop_channels[right] * right_share[:, None])
+    channels = channels.astype(numpy.uint32)
+    if opaque:
+        channels[:, 0] = 0xff
+    return ((channels[:, 0] << 24) | (channels[:, 1] << 16) |
+            (channels[:, 2] << 8) | channels[:, 3])
+
+
+def _build_lookup_table(param):
+    """Samples a gradient param at lut_size evenly spaced phases, in the
+    middle of the phases each entry is looked up for."""
+    last = param.lut_size - 1
+    offset = 0.5 - param.lut_rounding
+    return array('I', (pack_color(param.interpolate_color((i + offset) / last))
+                       for i in range(param.lut_size)))
+
+
+def _lookup_phases(lut, phases, rounding):
+    """Looks up packed colors for an array of phases in a lookup table."""
+    import numpy
+    table = numpy.frombuffer(lut, dtype=numpy.uint32)
+    last = len(table) - 1
+    indices = (numpy.clip(phases, 0.0, 1.0) * last +
+               rounding).astype(numpy.intp)
+    return table[indices]
+
+
+def _store_colors(packed, out, indices):
+    """Writes packed colors into a FrameBuffer or array, if given."""
+    if out is None:
+        return packed
+    if isinstance(out, FrameBuffer):
+        view = out.as_numpy()
+        if indices is None:
+            view[:] = packed
+            out.mark_all_dirty()
+        else:
+            view[indices] = packed
+            out.dirty.update(int(i) for i in indices)
+    elif indices is None:
+        out[:] = packed
+    else:
+        out[indices] = packed
+    return packed
 
 
 class Param(ABC):
@@ -110,18 +183,106 @@ class ARGB(ValueParam):
                 f'{self.default_value}')
 
 
-class Gradient(ValueParam):
-    def __init__(self, name, prefix='', postfix='',
-                 default_value=GradientColorStops()):
-        super().__init__('gradient', name, default_value)
+class _GradientParam(ValueParam):
+    """Gradient param answering phase lookups from a cached table.
+
+    Subclasses provide stops_class and color_class and interpolate between
+    their color stops in interpolate_color(). Phases are rounded to the
+    nearest table entry, or truncated with a lut_rounding of 0.0.
+    """
+
+    lut_rounding = 0.5
+    # Whether the stops have no alpha channel to interpolate
+    opaque = False
+
+    def __init__(self, type_name, name, prefix, postfix, default_value,
+                 lut_size):
+        if lut_size < 0 or lut_size == 1:
+            raise ValueError(f'lut_size must be 0 or at least 2, '
+                             f'not {lut_size}')
+        super().__init__(type_name, name, default_value)
         self.prefix = prefix
         self.postfix = postfix
+        # Number of precomputed colors; 0 disables the lookup table
+        self.lut_size = lut_size
+        self._lut = None
+        self._lut_value = None
 
     def set_value_from_str(self, string):
         """Sets the property's value from a string given by ckb."""
-        self.value = GradientColorStops.from_str(string)
+        self.value = self.stops_class.from_str(string)
+        self.invalidate_lut()
+
+    def invalidate_lut(self):
+        """Discards the lookup table; it is rebuilt on the next lookup."""
+        self._lut = None
+        self._lut_value = None
+
+    @property
+    def lut(self):
+        """Packed ARGB colors sampled evenly over the phases [0.0,1.0]."""
+        if self._lut is None or self._lut_value is not self.value:
+            self._lut = _build_lookup_table(self)
+            self._lut_value = self.value
+        return self._lut
+
+    def _lut_index(self, phase, last):
+        return int(max(0.0, min(1.0, phase)) * last + self.lut_rounding)
+
+    def get_packed_color_for_phase(self, phase):
+        """Looks up the packed ARGB color for the given phase in [0.0,1.0]."""
+        if not self.lut_size:
+            return pack_color(self.interpolate_color(phase))
+        lut = self.lut
+        return lut[self._lut_index(phase, len(lut) - 1)]
 
     def get_color_for_phase(self, phase):
+        """Returns the gradient's color for the given phase in [0.0,1.0]."""
+        if not self.lut_size:
+            return self.interpolate_color(phase)
+        return self.color_class.from_packed(
+            self.get_packed_color_for_phase(phase))
+
+    def get_colors_for_phases(self, phases, out=None, indices=None):
+        """Calculates packed ARGB colors for an array of phases at once.
+
+        Requires NumPy. Colors come from the lookup table unless lut_size is
+        0. If out is given (a FrameBuffer or uint32 array), the colors are
+        written into it, at the given indices if any.
+        """
+        import numpy
+        phases = numpy.asarray(phases, dtype=float)
+        if self.lut_size:
+            packed = _lookup_phases(self.lut, phases, self.lut_rounding)
+        else:
+            packed = _sample_color_stops(self.value.color_stops,
+                                         self.stop_positions(phases),
+                                         self.opaque)
+        return _store_colors(packed, out, indices)
+
+    def format_params(self):
+        return (f'{quote(self.prefix)} {quote(self.postfix)} '
+                f'{quote(str(self.default_value))}')
+
+
+class Gradient(_GradientParam):
+    stops_class = GradientColorStops
+    color_class = RGBColor
+    opaque = True
+    # Colors only change with whole percents: 101 entries indexed by
+    # truncated percent match interpolate_color() exactly
+    lut_rounding = 0.0
+
+    def __init__(self, name, prefix='', postfix='',
+                 default_value=GradientColorStops(), lut_size=101):
+        super().__init__('gradient', name, prefix, postfix, default_value,
+                         lut_size)
+
+    def stop_positions(self, phases):
+        import numpy
+        return numpy.clip(numpy.floor(phases * 100), 0, 100)
+
+    def interpolate_color(self, phase):
         """Calculates the gradient's color for the given phase in [0.0,1.0]."""
         phase_percent = max(0, min(100, int(phase * 100)))
         color_stops = self.value.color_stops
@@ -150,23 +311,21 @@ class Gradient(ValueParam):
             b=int(left[1].b * left_share + right[1].b * right_share)
         )
 
-    def format_params(self):
-        return (f'{quote(self.prefix)} {quote(self.postfix)} '
-                f'{quote(str(self.default_value))}')
 
+class AGradient(_GradientParam):
+    stops_class = AGradientColorStops
+    color_class = ARGBColor
 
-class AGradient(ValueParam):
     def __init__(self, name, prefix='', postfix='',
-                 default_value=AGradientColorStops()):
-        super().__init__('agradient', name, default_value)
-        self.prefix = prefix
-        self.postfix = postfix
+                 default_value=AGradientColorStops(), lut_size=256):
+        super().__init__('agradient', name, prefix, postfix, default_value,
+                         lut_size)
 
-    def set_value_from_str(self, string):
-        """Sets the property's value from a string given by ckb."""
-        self.value = AGradientColorStops.from_str(string)
+    def stop_positions(self, phases):
+        import numpy
+        return numpy.clip(phases * 100, 0.0, 100.0)
 
-    def get_color_for_phase(self, phase):
+    def interpolate_color(self, phase):
         """Calculates the gradient's color for the given phase in [0.0,1.0]."""
         phase_percent = max(0.0, min(100.0, phase * 100))
         color_stops = self.value.color_stops
@@ -196,10 +355,6 @@ class AGradient(ValueParam):
             b=int(left[1].b * left_share + right[1].b * right_share)
         )
 
-    def format_params(self):
-        return (f'{quote(self.prefix)} {quote(self.postfix)} '
-                f'{quote(str(self.default_value))}')
-
 
 class Angle(ValueParam):
     def __init__(self, name, prefix='', postfix='', default_value=0):
@@ -0,0 +1,146 @@
+import os
+import select
+from collections import deque
+
+KEYCOUNT = r'keycount (\d+)'
+KEYMAP_KEY = r'key (\S+) (\d+),(\d+)'
+PARAM = r'param (\w+) (.*)'
+KEY_EVENT = r'(?:(\d+),(\d+)|(\S+)) (down|up)'
+
+# Patterns are compiled (and re and urllib imported) on first use only, which
+# keeps importing ckbpy cheap when ckb merely asks for an effect's info.
+_compiled = {}
+
+
+def _match(pattern, string):
+    compiled = _compiled.get(pattern)
+    if compiled is None:
+        import re
+        compiled = _compiled[pattern] = re.compile(pattern)
+    return compiled.match(string)
+
+
+def quote(string):
+    """Percent-encodes a field sent to ckb."""
+    import urllib.parse
+    return urllib.parse.quote(string)
+
+
+def unquote(string):
+    """Decodes a percent-encoded field received from ckb."""
+    if '%' not in string:
+        return string
+    import urllib.parse
+    return urllib.parse.unquote(string)
+
+
+def split_command(line):
+    """Splits a line into its command and the (possibly empty) arguments."""
+    command, _, args = line.partition(' ')
+    return command, args
+
+
+def parse_keycount(line):
+    """Parses a 'keycount' line, returning None for any other line."""
+    match = _match(KEYCOUNT, line)
+    if match is None:
+        return None
+    return int(match.group(1))
+
+
+def parse_keymap_key(line):
+    """Parses a keymap entry into a (name, x, y) tuple or None."""
+    match = _match(KEYMAP_KEY, line)
+    if match is None:
+        return None
+    return (unquote(match.group(1)),
+            int(match.group(2)), int(match.group(3)))
+
+
+def parse_param(line):
+    """Parses a 'param' line into a (name, value string) tuple or None."""
+    match = _match(PARAM, line)
+    if match is None:
+        return None
+    return match.group(1), unquote(match.group(2))
+
+
+def parse_key_event(args):
+    """Parses the arguments of a 'key' line into a (name, x, y, state) tuple.
+
+    Depending on the effect's kpmode either the name or the position of the
+    key is None. Returns None if the arguments are malformed.
+    """
+    match = _match(KEY_EVENT, args)
+    if match is None:
+        return None
+    state = match.group(4) == 'down'
+    if match.group(3) is not None:
+        return unquote(match.group(3)), None, None, state
+    return None, int(match.group(1)), int(match.group(2)), state
+
+
+class LineReader(object):
+    """Line reader that can tell how many lines are already waiting.
+
+    Reads a stream's file descriptor directly, so lines buffered in the pipe
+    can be drained without blocking. Streams without a file descriptor are
+    read line by line and never report waiting lines. on_data, if given, is
+    called with all raw data read, e.g. to record it.
+    """
+
+    def __init__(self, stream, chunk_size=64 * 1024, on_data=None):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.on_data = on_data
+        try:
+            self.fd = stream.fileno()
+        except (AttributeError, OSError, ValueError):
+            self.fd = None
+        self.lines = deque()
+        self.eof = False
+        self._partial = b''
+
+    def _read(self, block):
+        """Reads the next chunk, returning whether any data was read."""
+        if self.fd is None:
+            line = self.stream.readline()
+            if not line:
+                self.eof = True
+                return False
+            if self.on_data is not None:
+                self.on_data(line.encode())
+            self.lines.append(line.rstrip('\n'))
+            return True
+
+        if not block and not select.select([self.fd], [], [], 0)[0]:
+            return False
+        data = os.read(self.fd, self.chunk_size)
+        if self.on_data is not None and data:
+            self.on_data(data)
+        if not data:
+            self.eof = True
+            if self._partial:
+                self.lines.append(self._partial.decode())
+                self._partial = b''
+            return False
+        parts = (self._partial + data).split(b'\n')
+        self._partial = parts.pop()
+        self.lines.extend(part.decode() for part in parts)
+        return True
+
+    def readline(self):
+        """Returns the next line including its newline, or '' at EOF."""
+        while not self.lines:
+            if self.eof:
+                return ''
+            self._read(block=True)
+        return self.lines.popleft() + '\n'
+
+    def drain(self):
+        """Reads all lines available without blocking and returns whether
+        any lines are waiting."""
+        if self.fd is not None:
+            while not self.eof and self._read(block=False):
+                pass
+        return bool(self.lines)
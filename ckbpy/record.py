@@ -0,0 +1,165 @@
+import io
+import time
+import queue
+import struct
+import threading
+
+MAGIC = b'CKBPYREC\x01'
+
+# Record kinds
+SESSION = 0
+INPUT = 1
+OUTPUT = 2
+
+# kind, nanoseconds since the start of the session, payload length
+RECORD_HEADER = struct.Struct('<BQI')
+
+
+class SessionRecorder(object):
+    """Appends the traffic between ckb and an effect to a binary log.
+
+    Every record consists of a RECORD_HEADER followed by its payload: the
+    raw bytes read from stdin (INPUT) or written to stdout (OUTPUT). Each
+    session starts with a SESSION record. Records are collected in memory
+    and written to the file by a background thread.
+    """
+
+    def __init__(self, path, buffer_size=64 * 1024):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True,
+                                        name='ckbpy-recorder')
+        self._thread.start()
+        self._start = time.monotonic_ns()
+        self.record(SESSION, b'')
+
+    def record(self, kind, data):
+        timestamp = time.monotonic_ns() - self._start
+        with self._lock:
+            buf = self._buffer
+            buf += RECORD_HEADER.pack(kind, timestamp, len(data))
+            buf += data
+            if len(buf) >= self.buffer_size:
+                self._queue.put(bytes(buf))
+                del buf[:]
+
+    def _write_loop(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            self.file.write(chunk)
+
+    def close(self):
+        with self._lock:
+            if self._buffer:
+                self._queue.put(bytes(self._buffer))
+                del self._buffer[:]
+        self._queue.put(None)
+        self._thread.join()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def wrap(self, stdin, stdout):
+        """Returns text streams teeing stdin and stdout into the log."""
+        stdin = io.TextIOWrapper(io.BufferedReader(
+            _TeeReader(getattr(stdin, 'buffer', stdin), self)))
+        stdout = io.TextIOWrapper(
+            _TeeWriter(getattr(stdout, 'buffer', stdout), self),
+            write_through=True)
+        return stdin, stdout
+
+
+class _TeeReader(io.RawIOBase):
+    def __init__(self, source, recorder):
+        self.source = source
+        self.recorder = recorder
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        read = getattr(self.source, 'read1', self.source.read)
+        data = read(len(b))
+        if data:
+            self.recorder.record(INPUT, data)
+        b[:len(data)] = data
+        return len(data)
+
+
+class _TeeWriter(io.RawIOBase):
+    def __init__(self, target, recorder):
+        self.target = target
+        self.recorder = recorder
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        data = bytes(b)
+        self.target.write(data)
+        self.recorder.record(OUTPUT, data)
+        return len(data)
+
+    def flush(self):
+        self.target.flush()
+
+
+def read_records(path):
+    """Yields the (kind, timestamp in ns, payload) records of a log."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a ckbpy session recording')
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            kind, timestamp, length = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                # The recording was cut off mid-record
+                return
+            yield kind, timestamp, data
+
+
+def read_sessions(path):
+    """Returns the records of a log grouped into sessions."""
+    sessions = []
+    for record in read_records(path):
+        if record[0] == SESSION:
+            sessions.append([])
+        elif sessions:
+            sessions[-1].append(record)
+    return sessions
+
+
+def session_input(path, session=0):
+    """Returns everything ckb sent to the effect during a session."""
+    return b''.join(data for kind, _, data in read_sessions(path)[session]
+                    if kind == INPUT)
+
+
+def replay(path, effect, session=0, stdout=None):
+    """Runs an effect's main() on the input recorded in a session.
+
+    Returns the effect's output unless a stdout stream was given.
+    """
+    stdin = io.TextIOWrapper(io.BytesIO(session_input(path, session)))
+    if stdout is not None:
+        effect.main(stdin, stdout)
+        return None
+    output = io.BytesIO()
+    stdout = io.TextIOWrapper(output, write_through=True)
+    effect.main(stdin, stdout)
+    return output.getvalue()
@@ -0,0 +1,77 @@
+import threading
+from array import array
+
+
+class RenderWorker(object):
+    """Renders the next frame in a background thread.
+
+    After a frame has been sent, the worker immediately calls the effect's
+    render() and keeps the result in a second buffer, so the next
+    'frame' command only has to send it. Frames therefore reflect the state
+    from one frame earlier, but rendering overlaps with waiting for ckb.
+
+    The effect's state must only be changed while holding the worker's lock;
+    Effect.main does this for all commands it dispatches.
+    """
+
+    def __init__(self, effect):
+        self.effect = effect
+        self.lock = threading.Lock()
+        self.colors = array('I', effect.frame_buffer.colors)
+        self.dirty = set()
+        self._render_requested = threading.Event()
+        self._frame_ready = threading.Event()
+        self._stopped = False
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='ckbpy-render')
+
+    def start(self):
+        self._thread.start()
+        self.request_frame()
+
+    def stop(self):
+        self._stopped = True
+        self._render_requested.set()
+        self._thread.join()
+
+    def request_frame(self):
+        """Starts rendering the next frame in the background."""
+        self._frame_ready.clear()
+        self._render_requested.set()
+
+    def wait_for_frame(self):
+        """Blocks until the requested frame has been rendered."""
+        self._frame_ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def locked(self, handler):
+        """Wraps a command handler so it runs while no frame is rendered."""
+        lock = self.lock
+
+        def locked_handler(args):
+            with lock:
+                handler(args)
+        return locked_handler
+
+    def _run(self):
+        effect = self.effect
+        while True:
+            self._render_requested.wait()
+            self._render_requested.clear()
+            if self._stopped:
+                return
+            try:
+                with self.lock:
+                    effect.render()
+                    frame_buffer = effect.frame_buffer
+                    self.colors[:] = frame_buffer.colors
+                    self.dirty |= frame_buffer.dirty
+                    frame_buffer.dirty.clear()
+            except Exception as e:
+                # Re-raised on the main thread by wait_for_frame()
+                self._error = e
+                self._frame_ready.set()
+                return
+            self._frame_ready.set()
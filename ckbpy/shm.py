@@ -0,0 +1,140 @@
+import os
+import mmap
+import time
+import struct
+from array import array
+
+MAGIC = b'CKBF'
+VERSION = 1
+
+# magic, version, key count, size of the key name table, sequence counter.
+# Native byte order, as the file is only shared between local processes.
+HEADER = struct.Struct('=4sIIIQ')
+SEQUENCE_OFFSET = 16
+
+
+def _colors_offset(names_size):
+    # Keep the color array aligned to 4 bytes
+    return HEADER.size + ((names_size + 3) & ~3)
+
+
+class SharedFrameWriter(object):
+    """Publishes frames in a memory-mapped file for other local processes.
+
+    The file holds a HEADER, the key names (newline-separated UTF-8) and the
+    packed ARGB color of each key in keymap order. The sequence counter works
+    as a seqlock: it is odd while a frame is being written and increases by
+    two with every published frame, so readers can tell torn and new frames
+    apart without locking.
+    """
+
+    def __init__(self, path, key_names):
+        self.path = path
+        names = '\n'.join(key_names).encode()
+        self.key_count = len(key_names)
+        offset = _colors_offset(len(names))
+        size = offset + 4 * self.key_count
+
+        # Build the file next to its destination and move it into place, so
+        # readers only ever see complete files.
+        temp_path = f'{path}.{os.getpid()}'
+        fd = os.open(temp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self.mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self.mmap[:HEADER.size] = HEADER.pack(MAGIC, VERSION, self.key_count,
+                                              len(names), 0)
+        self.mmap[HEADER.size:HEADER.size + len(names)] = names
+        os.replace(temp_path, path)
+
+        view = memoryview(self.mmap)
+        self._sequence = view[SEQUENCE_OFFSET:HEADER.size].cast('Q')
+        self._colors = view[offset:size].cast('I')
+
+    @property
+    def sequence(self):
+        return self._sequence[0]
+
+    def write(self, colors):
+        """Publishes a frame containing every key."""
+        self._sequence[0] += 1
+        self._colors[:] = array('I', colors)
+        self._sequence[0] += 1
+
+    def write_keys(self, colors, indices):
+        """Publishes a frame in which only the given keys changed."""
+        shared = self._colors
+        self._sequence[0] += 1
+        for i in indices:
+            shared[i] = colors[i]
+        self._sequence[0] += 1
+
+    def close(self):
+        # The file stays in place so readers still see the last frame
+        self._sequence.release()
+        self._colors.release()
+        self.mmap.close()
+
+
+class SharedFrameReader(object):
+    """Reads frames published by a SharedFrameWriter."""
+
+    def __init__(self, path):
+        self.path = path
+        self.mmap = None
+        self.open()
+
+    def open(self):
+        """Maps the file at path, replacing a previously mapped one."""
+        self.close()
+        with open(self.path, 'rb') as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, key_count, names_size, _ = HEADER.unpack_from(
+            self.mmap)
+        if magic != MAGIC or version != VERSION:
+            self.mmap.close()
+            self.mmap = None
+            raise ValueError(f'{self.path} is not a ckbpy frame file')
+        names = self.mmap[HEADER.size:HEADER.size + names_size].decode()
+        self.names = names.split('\n') if key_count else []
+        self.key_count = key_count
+        self._start = _colors_offset(names_size)
+        self._end = self._start + 4 * key_count
+        self._sequence = memoryview(self.mmap)[
+            SEQUENCE_OFFSET:HEADER.size].cast('Q')
+
+    def replaced(self):
+        """Returns whether a writer has replaced the file since it was
+        opened, e.g. because the effect was restarted with another keymap."""
+        try:
+            return os.stat(self.path).st_ino != self.inode
+        except OSError:
+            return False
+
+    @property
+    def sequence(self):
+        return self._sequence[0]
+
+    def read(self, retries=100):
+        """Returns the sequence number and colors of the latest complete
+        frame."""
+        for _ in range(retries):
+            sequence = self._sequence[0]
+            if sequence & 1:
+                # The writer is in the middle of a frame
+                time.sleep(0)
+                continue
+            colors = array('I')
+            colors.frombytes(self.mmap[self._start:self._end])
+            if self._sequence[0] == sequence:
+                return sequence, colors
+        raise TimeoutError(f'No consistent frame in {self.path}')
+
+    def close(self):
+        if self.mmap is not None:
+            self._sequence.release()
+            self.mmap.close()
+            self.mmap = None
@@ -0,0 +1,103 @@
+import math
+
+
+class KeyIndex(object):
+    """Position-based lookup of keys.
+
+    Keys are hashed by their exact coordinates and sorted into a uniform grid
+    for nearest-key and radius queries.
+    """
+
+    def __init__(self, keys, cell_size=None):
+        keys = list(keys)
+        self.positions = {}
+        for key in keys:
+            self.positions.setdefault((key.x, key.y), key)
+
+        if cell_size is None:
+            cell_size = self._default_cell_size(keys)
+        self.cell_size = cell_size
+
+        self.cells = {}
+        for key in keys:
+            self.cells.setdefault(self._cell(key.x, key.y), []).append(key)
+        if self.cells:
+            self.min_cell = (min(cx for cx, _ in self.cells),
+                             min(cy for _, cy in self.cells))
+            self.max_cell = (max(cx for cx, _ in self.cells),
+                             max(cy for _, cy in self.cells))
+
+    @staticmethod
+    def _default_cell_size(keys):
+        # Aim for roughly one key per cell
+        if len(keys) < 2:
+            return 1
+        width = max(k.x for k in keys) - min(k.x for k in keys)
+        height = max(k.y for k in keys) - min(k.y for k in keys)
+        return max(1, math.sqrt(max(width, 1) * max(height, 1) / len(keys)))
+
+    def _cell(self, x, y):
+        return (int(x // self.cell_size), int(y // self.cell_size))
+
+    def _ring(self, cx, cy, radius):
+        """Yields the keys in the cells at the given ring around a cell."""
+        cells = self.cells
+        for dx in range(-radius, radius + 1):
+            for dy in range(-radius, radius + 1):
+                if max(abs(dx), abs(dy)) != radius:
+                    continue
+                keys = cells.get((cx + dx, cy + dy))
+                if keys is not None:
+                    yield from keys
+
+    def key_at(self, x, y):
+        """Returns the key at exactly the given position or None."""
+        return self.positions.get((x, y), None)
+
+    def nearest(self, x, y, max_distance=None):
+        """Returns the key closest to the given position or None."""
+        if not self.cells:
+            return None
+        cx, cy = self._cell(x, y)
+        # Number of rings needed to cover every occupied cell
+        max_radius = max(abs(cx - self.min_cell[0]),
+                         abs(cx - self.max_cell[0]),
+                         abs(cy - self.min_cell[1]),
+                         abs(cy - self.max_cell[1]))
+        best = None
+        best_distance = math.inf
+        for radius in range(max_radius + 1):
+            for key in self._ring(cx, cy, radius):
+                distance = math.hypot(key.x - x, key.y - y)
+                if distance < best_distance:
+                    best = key
+                    best_distance = distance
+            # Keys in further rings are at least this far away
+            if best_distance <= radius * self.cell_size:
+                break
+        if max_distance is not None and best_distance > max_distance:
+            return None
+        return best
+
+    def keys_within(self, x, y, radius):
+        """Returns all keys within the given distance of a position."""
+        if not self.cells:
+            return []
+        min_cx, min_cy = self._cell(x - radius, y - radius)
+        max_cx, max_cy = self._cell(x + radius, y + radius)
+        # Don't visit cells outside of the keyboard
+        min_cx = max(min_cx, self.min_cell[0])
+        min_cy = max(min_cy, self.min_cell[1])
+        max_cx = min(max_cx, self.max_cell[0])
+        max_cy = min(max_cy, self.max_cell[1])
+        radius_squared = radius * radius
+        cells = self.cells
+        found = []
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                for key in cells.get((cx, cy), ()):
+                    dx = key.x - x
+                    dy = key.y - y
+                    if dx * dx + dy * dy <= radius_squared:
+                        found.append(key)
+        return found
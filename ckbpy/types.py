@@ -1,7 +1,65 @@
-import re
+_HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+
+
+def _parse_hex(string, length):
+    """Parses a hex string of exactly the given length, or returns None."""
+    if len(string) != length or not _HEX_DIGITS.issuperset(string):
+        return None
+    return int(string, 16)
+
+
+def lerp_packed(a, b, t):
+    """Linearly interpolates between two packed ARGB colors."""
+    u = 1.0 - t
+    return ((int((a >> 24) * u + (b >> 24) * t) << 24) |
+            (int(((a >> 16) & 0xff) * u + ((b >> 16) & 0xff) * t) << 16) |
+            (int(((a >> 8) & 0xff) * u + ((b >> 8) & 0xff) * t) << 8) |
+            int((a & 0xff) * u + (b & 0xff) * t))
+
+
+def scale_packed(color, factor):
+    """Scales the color channels (not the alpha) of a packed ARGB color."""
+    return ((color & 0xff000000) |
+            (min(255, int(((color >> 16) & 0xff) * factor)) << 16) |
+            (min(255, int(((color >> 8) & 0xff) * factor)) << 8) |
+            min(255, int((color & 0xff) * factor)))
+
+
+BLEND_MODES = ('normal', 'add', 'multiply', 'screen')
+
+
+def _mix(dst, src, alpha, mode):
+    """Mixes one 8-bit channel of src into dst with the given opacity."""
+    if mode == 'add':
+        return min(255, int(dst + src * alpha))
+    if mode == 'multiply':
+        return int(dst * (1.0 - alpha + alpha * src / 255))
+    if mode == 'screen':
+        screened = 255 - (255 - dst) * (255 - src) / 255
+        return int(dst + (screened - dst) * alpha)
+    # normal
+    return int(dst + (src - dst) * alpha)
+
+
+def blend_packed(dst, src, mode='normal', opacity=1.0):
+    """Blends a packed ARGB color over another one using its alpha (scaled
+    by opacity) and one of the BLEND_MODES."""
+    alpha = (src >> 24) / 255 * opacity
+    if alpha <= 0.0:
+        return dst
+    if alpha >= 1.0 and mode == 'normal':
+        return src
+    dst_alpha = (dst >> 24) / 255
+    out_alpha = int((alpha + dst_alpha * (1.0 - alpha)) * 255 + 0.5)
+    return ((out_alpha << 24) |
+            (_mix((dst >> 16) & 0xff, (src >> 16) & 0xff, alpha, mode) << 16) |
+            (_mix((dst >> 8) & 0xff, (src >> 8) & 0xff, alpha, mode) << 8) |
+            _mix(dst & 0xff, src & 0xff, alpha, mode))
 
 
 class RGBColor:
+    __slots__ = ('r', 'g', 'b')
+
     def __init__(self, r=0, g=0, b=0):
         self.r = r
         self.g = g
@@ -17,18 +75,44 @@ class RGBColor:
         self.g = value[1]
         self.b = value[2]
 
+    @property
+    def packed(self):
+        """The color as a fully opaque 0xAARRGGBB integer."""
+        return 0xff000000 | (self.r << 16) | (self.g << 8) | self.b
+
+    @staticmethod
+    def from_packed(value):
+        return RGBColor((value >> 16) & 0xff, (value >> 8) & 0xff,
+                        value & 0xff)
+
     @staticmethod
     def from_str(string):
-        match = re.findall(r'[0-9a-f]{2}', string)
-        if match is None or len(match) != 3:
+        # Tolerate CSS-style '#rrggbb'
+        value = _parse_hex(string[1:] if string.startswith('#') else string,
+                           6)
+        if value is None:
             return None
-        return RGBColor(*[int(val, 16) for val in match])
+        return RGBColor(value >> 16, (value >> 8) & 0xff, value & 0xff)
+
+    def lerp(self, other, t):
+        """Returns the color at t in [0.0,1.0] between this and another."""
+        u = 1.0 - t
+        return RGBColor(int(self.r * u + other.r * t),
+                        int(self.g * u + other.g * t),
+                        int(self.b * u + other.b * t))
+
+    def scale(self, factor):
+        return RGBColor(min(255, int(self.r * factor)),
+                        min(255, int(self.g * factor)),
+                        min(255, int(self.b * factor)))
 
     def __str__(self):
-        return ''.join([f'{e:02x}' for e in self.rgb])
+        return f'{(self.r << 16) | (self.g << 8) | self.b:06x}'
 
 
 class ARGBColor:
+    __slots__ = ('a', 'r', 'g', 'b')
+
     def __init__(self, a=0, r=0, g=0, b=0):
         self.a = a
         self.r = r
@@ -46,15 +130,53 @@ class ARGBColor:
         self.g = value[2]
         self.b = value[3]
 
+    @property
+    def packed(self):
+        """The color as a 0xAARRGGBB integer."""
+        return (self.a << 24) | (self.r << 16) | (self.g << 8) | self.b
+
+    @staticmethod
+    def from_packed(value):
+        return ARGBColor(value >> 24, (value >> 16) & 0xff,
+                         (value >> 8) & 0xff, value & 0xff)
+
     @staticmethod
     def from_str(string):
-        match = re.findall(r'[0-9a-f]{2}', string)
-        if match is None or len(match) != 4:
+        value = _parse_hex(string[1:] if string.startswith('#') else string,
+                           8)
+        if value is None:
             return None
-        return ARGBColor(*[int(val, 16) for val in match])
+        return ARGBColor(value >> 24, (value >> 16) & 0xff,
+                         (value >> 8) & 0xff, value & 0xff)
+
+    def lerp(self, other, t):
+        """Returns the color at t in [0.0,1.0] between this and another."""
+        return ARGBColor.from_packed(lerp_packed(self.packed, other.packed, t))
+
+    def scale(self, factor):
+        """Returns the color with its channels (not alpha) scaled."""
+        return ARGBColor(self.a,
+                         min(255, int(self.r * factor)),
+                         min(255, int(self.g * factor)),
+                         min(255, int(self.b * factor)))
+
+    def blend(self, other):
+        """Returns another color blended over this one using its alpha."""
+        return ARGBColor.from_packed(blend_packed(self.packed, other.packed))
 
     def __str__(self):
-        return ''.join([f'{e:02x}' for e in self.argb])
+        return f'{self.packed:08x}'
+
+
+# ckb sends gradient stops with alpha; RGB gradients ignore it
+_GRADIENT_STOP = r'(\d+):(?:[0-9a-f]{2})?([0-9a-f]{6})'
+_AGRADIENT_STOP = r'(\d+):([0-9a-f]{8})'
+
+
+def _match(pattern, string):
+    # re is only imported once a gradient is actually parsed
+    import re
+    return re.fullmatch(pattern, string)
 
 
 class GradientColorStops:
@@ -64,7 +186,7 @@ class GradientColorStops:
     @staticmethod
     def from_str(string):
         def parse_color_stop(stop):
-            match = re.search(r'\d+:[0-9a-f]{2}', stop)
+            match = _match(_GRADIENT_STOP, stop)
             if match is None:
                 return None
             return (int(match.group(1)), RGBColor.from_str(match.group(2)))
@@ -83,7 +205,7 @@ class AGradientColorStops:
     @staticmethod
     def from_str(string):
         def parse_color_stop(stop):
-            match = re.search(r'(\d+):([0-9a-f]{8})', stop)
+            match = _match(_AGRADIENT_STOP, stop)
             if match is None:
                 return None
             return (int(match.group(1)), ARGBColor.from_str(match.group(2)))
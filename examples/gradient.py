@@ -1,17 +1,11 @@
 #!/usr/bin/env python
-import sys
 import ckbpy as ckb
 
 
-class Animation:
-    def __init__(self, target=0.0, phase=0.0):
-        self.target = target
-        self.phase = phase
-
-
 class GradientEffect(ckb.Effect):
     def __init__(self):
-        default_gradient = ckb.AGradientColorStops([(0, 'ffffffff')])
+        default_gradient = ckb.AGradientColorStops(
+            [(0, ckb.ARGBColor.from_str('ffffffff'))])
         params = [ckb.AGradient("gradient", "Gradient:",
                                 default_value=default_gradient)]
 
@@ -47,33 +41,23 @@ class GradientEffect(ckb.Effect):
                          license='GPL-2.0',
                          description='Transition between two colours',
                          params=params,
-                         presets=presets)
-        self.animations = {}
+                         presets=presets,
+                         delta_frames=True)
+
+    def build_keymap(self, entries):
+        keys = super().build_keymap(entries)
+        # The animator is advanced automatically with every 'time' command
+        self.animator = ckb.KeyAnimator(len(keys))
+        self.animator.set_phase(slice(None), 0.0)
+        return keys
 
     def keypress(self, key, state):
-        anim = self.animations.get(key.name, Animation())
         # Play gradient forwards if the key was pressed; backwards otherwise.
-        anim.target = 1.0 if state else 0.0
-        self.animations[key.name] = anim
-
-    def advance_time(self, delta_t):
-        finished_animations = []
-        for key_name, animation in self.animations.items():
-            if animation.target < animation.phase:
-                animation.phase = max(0, animation.phase - delta_t)
-            elif animation.target > animation.phase:
-                animation.phase = min(1, animation.phase + delta_t)
-            elif animation.target == 0.0:
-                finished_animations.append(key_name)
-        for key in finished_animations:
-            del self.animations[key]
+        self.animator.animate(key.index, 1.0 if state else 0.0)
 
     def update_colors(self):
-        gradient = self.params['gradient']
-        for key_name, animation in self.animations.items():
-            key_color = gradient.get_color_for_phase(animation.phase)
-            self.keys[key_name].color = key_color
+        self.animator.sample(self.params['gradient'], self.frame_buffer)
 
 
 if __name__ == '__main__':
-    GradientEffect().run(sys.argv)
+    ckb.run(GradientEffect)
@@ -8,4 +8,5 @@ setup(name='ckbpy',
       author_email='jonas.auer.94@gmail.com',
       license='GPL-2.0',
       packages=['ckbpy'],
+      extras_require={'numpy': ['numpy']},
       zip_safe=True)
@@ -0,0 +1,103 @@
+import io
+import os
+import asyncio
+import unittest
+import ckbpy as ckb
+from ckbpy.aio import AsyncEffect
+from .util import RecordingEffect, session, run, frames
+
+SESSION = session('start', 'time 0.1', 'frame', 'key a down', 'frame',
+                  'key a up', 'key b down', 'time 0.2', 'frame',
+                  params=['speed 2.5'])
+
+
+class AsyncRecordingEffect(AsyncEffect):
+    """Asynchronous version of RecordingEffect."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('params', [ckb.Double('speed', default_value=1.0)])
+        super().__init__(guid='{00000000-0000-0000-0000-000000000002}',
+                         name='Async', version='0.0.0', year='2017',
+                         author='ckbpy', license='GPL-2.0', **kwargs)
+        self.calls = []
+
+    async def start(self):
+        self.calls.append(('start',))
+
+    async def advance_time(self, delta_t):
+        self.calls.append(('time', delta_t))
+
+    async def keypress(self, key, state):
+        # Let other tasks run in between
+        await asyncio.sleep(0)
+        self.calls.append(('key', key.name, state))
+        key.color = 0xff0000ff if state else 0xff000000
+
+    async def params_changed(self, names):
+        self.calls.append(('params', set(names)))
+
+    async def update_colors(self):
+        self.calls.append(('frame',))
+
+
+def run_async(effect, stdin):
+    stdout = io.TextIOWrapper(io.BytesIO(), write_through=True)
+    effect.main(stdin, stdout)
+    return stdout.buffer.getvalue().decode()
+
+
+class AsyncEffectTest(unittest.TestCase):
+    def setUp(self):
+        self.expected = run(RecordingEffect(), SESSION)
+
+    def assert_same_as_sync(self, effect, output):
+        sync_effect = RecordingEffect()
+        run(sync_effect, SESSION)
+        self.assertEqual(output, self.expected)
+        self.assertEqual(effect.calls, sync_effect.calls)
+
+    def test_text_stream(self):
+        effect = AsyncRecordingEffect()
+        output = run_async(effect, io.StringIO(SESSION))
+        self.assert_same_as_sync(effect, output)
+
+    def test_binary_stream(self):
+        effect = AsyncRecordingEffect()
+        output = run_async(effect,
+                           io.TextIOWrapper(io.BytesIO(SESSION.encode())))
+        self.assert_same_as_sync(effect, output)
+
+    def test_pipe(self):
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, SESSION.encode())
+        os.close(write_fd)
+        effect = AsyncRecordingEffect()
+        with open(read_fd, 'r') as stdin:
+            output = run_async(effect, stdin)
+        self.assert_same_as_sync(effect, output)
+
+    def test_tasks_cancelled(self):
+        class Ticking(AsyncRecordingEffect):
+            async def start(self):
+                self.ticks = 0
+                self.ticker = self.create_task(self.tick())
+
+            async def tick(self):
+                while True:
+                    self.ticks += 1
+                    await asyncio.sleep(0)
+
+        effect = Ticking()
+        output = run_async(effect, io.StringIO(SESSION))
+        self.assertEqual(len(frames(output)), 3)
+        self.assertTrue(effect.ticker.cancelled())
+        self.assertEqual(effect.tasks, set())
+
+    def test_unsupported_options(self):
+        for option in ('render_ahead', 'coalesce'):
+            with self.assertRaises(ValueError):
+                AsyncRecordingEffect(**{option: True})
+
+
+if __name__ == '__main__':
+    unittest.main()
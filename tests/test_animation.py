@@ -0,0 +1,75 @@
+import unittest
+import ckbpy as ckb
+from ckbpy.animation import EASE_IN
+from .util import RecordingEffect, session, run
+
+
+class Animated(RecordingEffect):
+    """Tweens a pressed key towards phase 1.0 at a tenth per second."""
+
+    def build_keymap(self, entries):
+        keys = super().build_keymap(entries)
+        self.animator = ckb.KeyAnimator(len(keys))
+        return keys
+
+    def keypress(self, key, state):
+        self.animator.animate(key.index, 1.0 if state else 0.0, speed=0.1)
+
+
+class KeyAnimatorTest(unittest.TestCase):
+    def setUp(self):
+        self.animator = ckb.KeyAnimator(3)
+
+    def test_advance(self):
+        self.animator.animate([0, 2], 1.0, speed=2.0)
+        self.animator.advance(0.25)
+        self.assertEqual(list(self.animator.phase), [0.5, 0.0, 0.5])
+        self.assertEqual(list(self.animator.finished), [])
+        self.animator.advance(0.5)
+        self.assertEqual(list(self.animator.phase), [1.0, 0.0, 1.0])
+        self.assertEqual(list(self.animator.finished), [0, 2])
+        self.assertFalse(self.animator.active.any())
+
+    def test_easing(self):
+        self.animator.animate(1, 1.0, easing=EASE_IN)
+        self.animator.advance(0.5)
+        self.assertEqual(self.animator.values[1], 0.25)
+
+    def test_set_phase(self):
+        self.animator.animate(0, 1.0)
+        self.animator.set_phase(0, 0.75)
+        self.animator.advance(1.0)
+        self.assertEqual(self.animator.phase[0], 0.75)
+
+    def test_sample(self):
+        gradient = ckb.AGradient('gradient', default_value=(
+            ckb.AGradientColorStops.from_str('0:ff000000 100:ffffffff')))
+        frame_buffer = ckb.FrameBuffer(['esc', 'a', 'b'])
+        self.animator.set_phase(slice(None), 1.0)
+        self.animator.sample(gradient, frame_buffer)
+        self.assertEqual(list(frame_buffer.colors), [0xffffffff] * 3)
+        self.assertFalse(self.animator.changed.any())
+
+
+class EffectAnimatorTest(unittest.TestCase):
+    def test_duration(self):
+        effect = Animated()
+        run(effect, session('start', 'key a down', 'time 0.5', 'frame'))
+        self.assertAlmostEqual(effect.animator.phase[1], 0.05)
+
+    def test_absolute_time(self):
+        effect = Animated(time=ckb.Time.ABSOLUTE)
+        run(effect, session('start', 'time 100.0', 'key a down',
+                            'time 100.5', 'frame'))
+        self.assertAlmostEqual(effect.animator.phase[1], 0.05)
+        self.assertEqual(effect.current_time, 100.5)
+
+    def test_absolute_time_after_restart(self):
+        effect = Animated(time=ckb.Time.ABSOLUTE)
+        run(effect, session('start', 'key a down', 'time 1.0', 'time 2.0',
+                            'stop', 'start', 'time 50.0', 'time 50.5'))
+        self.assertAlmostEqual(effect.animator.phase[1], 0.15)
+
+
+if __name__ == '__main__':
+    unittest.main()
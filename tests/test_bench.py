@@ -0,0 +1,69 @@
+import time
+import asyncio
+import unittest
+from ckbpy.bench import run_session, synthetic_session, PHASES
+from ckbpy.aio import AsyncEffect
+from .util import RecordingEffect, frames, run
+
+
+class SlowSetupEffect(RecordingEffect):
+    def build_keymap(self, entries):
+        time.sleep(0.05)
+        return super().build_keymap(entries)
+
+
+class SlowAsyncEffect(AsyncEffect):
+    def __init__(self):
+        super().__init__(guid='{00000000-0000-0000-0000-000000000003}',
+                         name='Slow', version='0.0.0', year='2017',
+                         author='ckbpy', license='GPL-2.0')
+
+    async def update_colors(self):
+        await asyncio.sleep(0.005)
+
+
+class BenchTest(unittest.TestCase):
+    def test_synthetic_session(self):
+        session = synthetic_session(RecordingEffect(), keys=30, frames=50,
+                                    keypress_rate=1.0)
+        output = run(RecordingEffect(), session)
+        self.assertEqual(len(frames(output)), 50)
+        self.assertEqual(len(frames(output)[0]), 30)
+        self.assertIn('param speed 1.0', session)
+        events = [line for line in session.splitlines()
+                  if line.endswith((' down', ' up'))]
+        self.assertEqual(len(events), 50)
+
+    def test_run_session(self):
+        effect = RecordingEffect()
+        session = synthetic_session(effect, frames=20)
+        result = run_session(effect, session)
+        self.assertEqual(result.frames, 20)
+        self.assertEqual(sorted(result.phases), sorted(PHASES))
+        self.assertGreater(result.bytes_written, 0)
+        self.assertGreaterEqual(result.phases['handle_time'], 0.0)
+        for name in PHASES:
+            self.assertNotIn(name, vars(effect))
+        self.assertNotIn('command_handlers', vars(effect))
+        self.assertIn('frames/s', result.report())
+
+    def test_setup_excluded(self):
+        effect = SlowSetupEffect()
+        result = run_session(effect, synthetic_session(effect, frames=5))
+        self.assertGreaterEqual(result.setup, 0.05)
+        self.assertLess(result.elapsed, 0.05)
+
+    def test_async_hooks(self):
+        effect = SlowAsyncEffect()
+        result = run_session(effect, synthetic_session(effect, frames=4))
+        self.assertGreaterEqual(result.phases['update_colors'], 0.02)
+
+    def test_allocations(self):
+        effect = RecordingEffect()
+        result = run_session(effect, synthetic_session(effect, frames=5),
+                             trace_allocations=True)
+        self.assertIsNotNone(result.peak_memory)
+
+
+if __name__ == '__main__':
+    unittest.main()
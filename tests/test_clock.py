@@ -0,0 +1,58 @@
+import unittest
+import ckbpy as ckb
+from .util import RecordingEffect, session, run
+
+
+class ClockTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = ckb.Clock(step=0.1, max_steps=4)
+
+    def test_advance(self):
+        self.assertEqual(self.clock.advance(0.05), 0)
+        self.assertEqual(self.clock.advance(0.25), 3)
+        self.assertEqual(self.clock.steps, 3)
+        self.assertAlmostEqual(self.clock.time, 0.3)
+        self.assertAlmostEqual(self.clock.alpha, 0.0)
+
+    def test_alpha(self):
+        self.clock.advance(0.125)
+        self.assertAlmostEqual(self.clock.alpha, 0.25)
+        self.assertAlmostEqual(self.clock.interpolate(2.0, 6.0), 3.0)
+
+    def test_max_steps(self):
+        self.assertEqual(self.clock.advance(0.65), 4)
+        self.assertAlmostEqual(self.clock.dropped, 0.2)
+        self.assertAlmostEqual(self.clock.alpha, 0.5)
+
+    def test_negative_time(self):
+        self.assertEqual(self.clock.advance(-1.0), 0)
+        self.assertEqual(self.clock.accumulator, 0.0)
+
+    def test_advance_to(self):
+        self.assertEqual(self.clock.advance_to(10.0), 0)
+        self.assertEqual(self.clock.advance_to(10.2), 2)
+        self.clock.sync()
+        self.assertEqual(self.clock.advance_to(20.0), 0)
+        self.assertEqual(self.clock.steps, 2)
+
+
+class EffectClockTest(unittest.TestCase):
+    def test_duration(self):
+        effect = RecordingEffect(clock=ckb.Clock(step=0.25))
+        run(effect, session('start', 'time 0.1', 'time 0.5', 'frame'))
+        self.assertEqual([call for call in effect.calls
+                          if call[0] == 'time'],
+                         [('time', 0.25), ('time', 0.25)])
+        self.assertAlmostEqual(effect.current_time, 0.6)
+
+    def test_absolute_time(self):
+        effect = RecordingEffect(time=ckb.Time.ABSOLUTE,
+                                 clock=ckb.Clock(step=0.5))
+        run(effect, session('start', 'time 100.0', 'time 101.0', 'stop',
+                            'start', 'time 5.0', 'time 5.5'))
+        self.assertEqual([call for call in effect.calls
+                          if call[0] == 'time'], [('time', 0.5)] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
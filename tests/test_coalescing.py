@@ -0,0 +1,86 @@
+import io
+import os
+import unittest
+from ckbpy.protocol import LineReader
+from .util import RecordingEffect, session, frames
+
+
+def run_piped(effect, text):
+    """Runs an effect with its whole input already waiting in a pipe."""
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, text.encode())
+    os.close(write_fd)
+    stdout = io.TextIOWrapper(io.BytesIO(), write_through=True)
+    with open(read_fd, 'r') as stdin:
+        effect.main(stdin, stdout)
+    return stdout.buffer.getvalue().decode()
+
+
+class LineReaderTest(unittest.TestCase):
+    def test_pipe(self):
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, b'time 0.1\nframe\nkey a do')
+        with open(read_fd, 'r') as stream:
+            reader = LineReader(stream)
+            self.assertEqual(reader.readline(), 'time 0.1\n')
+            self.assertTrue(reader.drain())
+            self.assertEqual(reader.readline(), 'frame\n')
+            # Only a partial line is waiting
+            self.assertFalse(reader.drain())
+            os.write(write_fd, b'wn\n')
+            os.close(write_fd)
+            self.assertEqual(reader.readline(), 'key a down\n')
+            self.assertEqual(reader.readline(), '')
+
+    def test_on_data(self):
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, b'start\nframe\n')
+        os.close(write_fd)
+        data = []
+        with open(read_fd, 'r') as stream:
+            reader = LineReader(stream, on_data=data.append)
+            while reader.readline():
+                pass
+        self.assertEqual(b''.join(data), b'start\nframe\n')
+
+    def test_without_file_descriptor(self):
+        reader = LineReader(io.StringIO('start\nframe\n'))
+        self.assertEqual(reader.readline(), 'start\n')
+        self.assertFalse(reader.drain())
+        self.assertEqual(reader.readline(), 'frame\n')
+        self.assertEqual(reader.readline(), '')
+
+
+class CoalescingTest(unittest.TestCase):
+    def test_merges_waiting_commands(self):
+        effect = RecordingEffect(coalesce=True)
+        output = run_piped(effect, session(
+            'start', 'time 0.1', 'frame', 'time 0.1', 'frame',
+            'time 0.1', 'frame'))
+        self.assertEqual(len(frames(output)), 1)
+        times = [call[1] for call in effect.calls if call[0] == 'time']
+        self.assertEqual(len(times), 1)
+        self.assertAlmostEqual(times[0], 0.3)
+        self.assertEqual(effect.coalesced_times, 2)
+        self.assertEqual(effect.dropped_frames, 2)
+
+    def test_keys_see_preceding_time(self):
+        effect = RecordingEffect(coalesce=True)
+        output = run_piped(effect, session(
+            'start', 'time 0.1', 'frame', 'key a down', 'time 0.2', 'frame'))
+        self.assertEqual(effect.calls[0], ('start',))
+        self.assertEqual(effect.calls[1:], [
+            ('time', 0.1), ('key', 'a', True), ('time', 0.2), ('frame',)])
+        self.assertEqual(frames(output)[-1]['a'], 'ff0000ff')
+
+    def test_same_result_as_uncoalesced(self):
+        text = session('start', 'time 0.1', 'key a down', 'frame',
+                       'time 0.1', 'key b down', 'frame', 'key a up',
+                       'frame')
+        coalesced = frames(run_piped(RecordingEffect(coalesce=True), text))
+        uncoalesced = frames(run_piped(RecordingEffect(), text))
+        self.assertEqual(coalesced[-1], uncoalesced[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import ckbpy as ckb
+from ckbpy.compositor import Compositor, Layer
+from ckbpy.types import blend_packed as blend
+from .util import RecordingEffect, session, run, frames
+
+
+class Highlight(RecordingEffect):
+    """Layer turning a pressed key half-transparent white."""
+
+    def keypress(self, key, state):
+        self.calls.append(('key', key.name, state))
+        key.color = 0x80ffffff if state else 0
+
+
+def compositor(layers, **kwargs):
+    return Compositor(layers, guid='{00000000-0000-0000-0000-000000000001}',
+                      name='Layers', version='0.0.0', year='2017',
+                      author='ckbpy', license='GPL-2.0', **kwargs)
+
+
+class BlendTest(unittest.TestCase):
+    def test_opaque(self):
+        self.assertEqual(blend(0xff0000ff, 0xffff0000), 0xffff0000)
+
+    def test_transparent(self):
+        self.assertEqual(blend(0xff0000ff, 0x00ff0000), 0xff0000ff)
+        self.assertEqual(blend(0xff0000ff, 0xffff0000, opacity=0.0),
+                         0xff0000ff)
+
+    def test_half(self):
+        self.assertEqual(blend(0xff000000, 0xffffffff, opacity=0.5),
+                         0xff7f7f7f)
+
+    def test_add(self):
+        self.assertEqual(blend(0xff808080, 0xffc0c0c0, 'add'), 0xffffffff)
+
+    def test_color_blend(self):
+        # Colors and the compositor blend the same way
+        dst = ckb.ARGBColor.from_packed(0x40102030)
+        src = ckb.ARGBColor.from_packed(0x40302010)
+        self.assertEqual(dst.blend(src).packed, blend(0x40102030, 0x40302010))
+        self.assertEqual(blend(0x40102030, 0x40302010), 0x70182027)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            Layer(RecordingEffect(), 'overlay')
+
+
+class CompositorTest(unittest.TestCase):
+    def test_layers_blended(self):
+        effect = compositor([RecordingEffect(), Highlight()],
+                            delta_frames=True)
+        output = run(effect, session('start', 'frame', 'key a down', 'frame',
+                                     'key b down', 'frame'))
+        self.assertEqual(frames(output), [
+            {'esc': '00000000', 'a': '00000000', 'b': '00000000'},
+            {'a': '%08x' % blend(0xff0000ff, 0x80ffffff)},
+            {'b': '%08x' % blend(0xff0000ff, 0x80ffffff)},
+        ])
+
+    def test_events_reach_layers(self):
+        layers = [RecordingEffect(), Highlight()]
+        run(compositor(layers), session('start', 'time 0.5', 'key a down',
+                                        'frame'))
+        for layer in layers:
+            self.assertEqual(layer.calls, [
+                ('start',), ('time', 0.5), ('key', 'a', True), ('frame',)])
+            self.assertEqual(layer.current_time, 0.5)
+
+    def test_shared_params(self):
+        layers = [RecordingEffect(), RecordingEffect()]
+        effect = compositor(layers)
+        run(effect, session('start', 'frame', params=['speed 2.5']))
+        self.assertIs(layers[0].params['speed'], layers[1].params['speed'])
+        self.assertEqual(layers[1].params['speed'].value, 2.5)
+        self.assertIn(('params', {'speed'}), layers[1].calls)
+
+    def test_layer_clock(self):
+        layer = RecordingEffect(clock=ckb.Clock(step=0.1))
+        run(compositor([layer]), session('start', 'time 0.25', 'frame'))
+        self.assertEqual(layer.calls, [
+            ('start',), ('time', 0.1), ('time', 0.1), ('frame',)])
+        self.assertAlmostEqual(layer.clock.alpha, 0.5)
+
+    def test_layer_animator(self):
+        class Animated(RecordingEffect):
+            def build_keymap(self, entries):
+                keys = super().build_keymap(entries)
+                self.animator = ckb.KeyAnimator(len(keys))
+                return keys
+
+            def keypress(self, key, state):
+                self.animator.animate(key.index, 1.0)
+
+        layer = Animated()
+        run(compositor([layer]), session('start', 'key a down', 'time 0.25',
+                                         'frame'))
+        self.assertEqual(list(layer.animator.phase), [0.0, 0.25, 0.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+from .util import RecordingEffect, session, run, frames
+
+
+class DeltaFramesTest(unittest.TestCase):
+    def test_only_changed_keys(self):
+        output = run(RecordingEffect(delta_frames=True),
+                     session('start', 'frame', 'key a down', 'frame', 'frame',
+                             'key a up', 'key b down', 'frame'))
+        self.assertEqual(frames(output), [
+            {'esc': '00000000', 'a': '00000000', 'b': '00000000'},
+            {'a': 'ff0000ff'},
+            {},
+            {'a': 'ff000000', 'b': 'ff0000ff'},
+        ])
+
+    def test_full_frame_after_start(self):
+        output = run(RecordingEffect(delta_frames=True),
+                     session('start', 'key a down', 'frame', 'frame',
+                             'stop', 'start', 'frame'))
+        self.assertEqual(frames(output), [
+            {'esc': '00000000', 'a': 'ff0000ff', 'b': '00000000'},
+            {},
+            {'esc': '00000000', 'a': 'ff0000ff', 'b': '00000000'},
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
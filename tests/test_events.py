@@ -0,0 +1,66 @@
+import math
+import unittest
+from ckbpy.events import KeyEventQueue
+from .util import RecordingEffect, session, run, frames
+
+
+class KeyEventQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.queue = KeyEventQueue(3, capacity=4, half_life=1.0)
+
+    def test_push(self):
+        self.queue.push(0.5, 1, True)
+        self.queue.push(0.75, 1, False)
+        self.assertEqual(list(self.queue), [(0.5, 1, True), (0.75, 1, False)])
+        self.queue.clear()
+        self.assertEqual(len(self.queue), 0)
+        self.assertEqual(list(self.queue), [])
+
+    def test_overflow(self):
+        for i in range(6):
+            self.queue.push(float(i), i % 3, True)
+        self.assertEqual(self.queue.dropped, 2)
+        self.assertEqual([event[0] for event in self.queue],
+                         [2.0, 3.0, 4.0, 5.0])
+        times, indices, states = self.queue.columns()
+        self.assertEqual(list(times), [2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(list(indices), [2, 0, 1, 2])
+        self.assertEqual(list(states), [1] * 4)
+
+    def test_press_rates(self):
+        self.queue.push(0.0, 0, True)
+        self.queue.push(0.5, 0, False)
+        self.queue.push(1.0, 0, True)
+        self.queue.push(1.0, 2, True)
+        self.assertEqual(list(self.queue.press_counts), [2, 0, 1])
+        decay = math.log(2)
+        rates = self.queue.press_rates(2.0)
+        self.assertAlmostEqual(rates[0], 1.5 * decay / 2)
+        self.assertEqual(rates[1], 0.0)
+        self.assertAlmostEqual(rates[2], decay / 2)
+
+
+class BatchKeysTest(unittest.TestCase):
+    def test_delivered_before_frame(self):
+        effect = RecordingEffect(batch_keys=True)
+        output = run(effect, session('start', 'key a down', 'key b down',
+                                     'key a up', 'frame', 'frame'))
+        self.assertEqual(effect.calls[1:5], [
+            ('key', 'a', True), ('key', 'b', True), ('key', 'a', False),
+            ('frame',),
+        ])
+        self.assertEqual(frames(output)[0]['b'], 'ff0000ff')
+        self.assertEqual(len(effect.key_events), 0)
+
+    def test_event_times(self):
+        effect = RecordingEffect(batch_keys=True)
+        times = []
+        effect.keypresses = lambda events: times.extend(
+            time for time, _, _ in events)
+        run(effect, session('start', 'time 0.5', 'key a down', 'time 0.25',
+                            'key a up', 'frame'))
+        self.assertEqual(times, [0.5, 0.75])
+
+
+if __name__ == '__main__':
+    unittest.main()
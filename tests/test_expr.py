@@ -0,0 +1,87 @@
+import unittest
+import numpy
+import ckbpy as ckb
+from ckbpy.expr import parse_formula, FormulaKernel
+from ckbpy.geometry import KeyGeometry
+from ckbpy.effect import Key
+from .util import session, run, frames
+
+
+def geometry():
+    return KeyGeometry([Key('esc', 0, 0, index=0), Key('a', 10, 0, index=1),
+                        Key('b', 20, 5, index=2)])
+
+
+class ParseFormulaTest(unittest.TestCase):
+    def test_valid(self):
+        parse_formula('fract(nx + t * speed) * pi', {'speed'})
+        parse_formula('where(distance < 5, 1, 0)')
+
+    def test_invalid(self):
+        for formula in ('nx +', 'sin + 1', 'sin', 'foo * t', 'speed',
+                        '__import__("os")', 'x.real', 'sin(x=nx)',
+                        '"a"', '0 < nx < 1', '[nx]', 'nx if t else ny'):
+            with self.subTest(formula=formula):
+                self.assertRaises(ValueError, parse_formula, formula)
+
+
+class FormulaKernelTest(unittest.TestCase):
+    def kernel(self, formula, **values):
+        return FormulaKernel(parse_formula(formula, values), values,
+                             geometry())
+
+    def test_evaluate(self):
+        kernel = self.kernel('fract(nx + t * speed)', speed=0.5)
+        self.assertTrue(kernel.time_dependent)
+        numpy.testing.assert_allclose(kernel.evaluate(0.5), [0.25, 0.75, 0.25])
+
+    def test_constant(self):
+        kernel = self.kernel('speed * 2', speed=0.25)
+        self.assertFalse(kernel.time_dependent)
+        numpy.testing.assert_allclose(kernel.evaluate(3.0), [0.5] * 3)
+
+    def test_key_only(self):
+        kernel = self.kernel('sqrt(x) + y')
+        self.assertFalse(kernel.time_dependent)
+        numpy.testing.assert_allclose(kernel.evaluate(1.0),
+                                      numpy.sqrt([0, 10, 20]) + [0, 0, 5])
+
+    def test_invalid_values(self):
+        kernel = self.kernel('log(nx - t)')
+        numpy.testing.assert_array_equal(
+            numpy.isfinite(kernel.evaluate(1.0)), [True] * 3)
+
+
+class FormulaEffectTest(unittest.TestCase):
+    def effect(self, formula):
+        gradient = ckb.Gradient('gradient', default_value=(
+            ckb.GradientColorStops.from_str('0:000000 100:ffffff')))
+        return ckb.FormulaEffect(
+            formula, guid='{00000000-0000-0000-0000-000000000000}',
+            name='Test', version='0.0.0', year='2017', author='ckbpy',
+            license='GPL-2.0', delta_frames=True,
+            params=[gradient, ckb.Double('speed', default_value=1.0)])
+
+    def test_frames(self):
+        output = run(self.effect('nx * speed'),
+                     session('start', 'frame', 'time 1.0', 'frame'))
+        self.assertEqual(frames(output), [
+            {'esc': 'ff000000', 'a': 'ff7f7f7f', 'b': 'ffffffff'},
+            {},
+        ])
+
+    def test_param_change(self):
+        output = run(self.effect('nx * speed'),
+                     session('start', 'frame', 'begin params',
+                             'param speed 0', 'end params', 'frame'))
+        self.assertEqual(frames(output)[1],
+                         {'a': 'ff000000', 'b': 'ff000000'})
+
+    def test_unknown_gradient(self):
+        self.assertRaises(ValueError, ckb.FormulaEffect, 'nx',
+                          gradient='missing', guid='', name='', version='',
+                          year='', author='', license='')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import io
+import unittest
+from ckbpy.frame import FrameWriter
+from .util import RecordingEffect, session, run, frames
+
+
+class FrameWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.stream = io.BytesIO()
+        self.writer = FrameWriter(['esc', 'a', 'b'], self.stream)
+
+    def test_write(self):
+        self.writer.write([0xff000000, 0x80ff0000, 0x0000ff00])
+        self.assertEqual(self.stream.getvalue(),
+                         b'begin frame\n'
+                         b'argb esc ff000000\n'
+                         b'argb a 80ff0000\n'
+                         b'argb b 0000ff00\n'
+                         b'end frame\n')
+
+    def test_write_keys(self):
+        self.writer.write_keys([0, 0x12345678, 0xffffffff], {2, 1})
+        self.assertEqual(self.stream.getvalue(),
+                         b'begin frame\n'
+                         b'argb a 12345678\n'
+                         b'argb b ffffffff\n'
+                         b'end frame\n')
+
+    def test_write_keys_empty(self):
+        self.writer.write_keys([0, 0, 0], set())
+        self.assertEqual(self.stream.getvalue(), b'begin frame\nend frame\n')
+
+    def test_write_after_write_keys(self):
+        self.writer.write_keys([0, 0xffffffff, 0], {1})
+        self.writer.write([0, 0, 0])
+        self.assertEqual(self.stream.getvalue().split(b'end frame\n')[1],
+                         b'begin frame\n'
+                         b'argb esc 00000000\n'
+                         b'argb a 00000000\n'
+                         b'argb b 00000000\n')
+
+
+class EffectFrameTest(unittest.TestCase):
+    def test_full_frames(self):
+        output = run(RecordingEffect(),
+                     session('start', 'frame', 'key a down', 'frame'))
+        self.assertEqual(frames(output), [
+            {'esc': '00000000', 'a': '00000000', 'b': '00000000'},
+            {'esc': '00000000', 'a': 'ff0000ff', 'b': '00000000'},
+        ])
+
+    def test_frame_per_command(self):
+        output = run(RecordingEffect(),
+                     session('start', 'frame', 'frame', 'frame'))
+        self.assertEqual(output.count('begin frame\n'), 3)
+        self.assertTrue(output.startswith('begin run\n'))
+        self.assertTrue(output.endswith('end frame\nend run\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
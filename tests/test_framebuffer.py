@@ -0,0 +1,58 @@
+import unittest
+import ckbpy as ckb
+from ckbpy.framebuffer import FrameBuffer, ColorView, pack_color
+from ckbpy.effect import Key
+
+
+class FrameBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.frame_buffer = FrameBuffer(['esc', 'a', 'b'])
+
+    def test_set(self):
+        self.assertEqual(list(self.frame_buffer.colors), [0, 0, 0])
+        self.assertEqual(self.frame_buffer.index, {'esc': 0, 'a': 1, 'b': 2})
+        self.frame_buffer.set(1, 0x80ff0000)
+        self.frame_buffer.set(2, ckb.ARGBColor(1, 2, 3, 4))
+        self.assertEqual(self.frame_buffer.get(1), 0x80ff0000)
+        self.assertEqual(self.frame_buffer.get(2), 0x01020304)
+        self.assertEqual(self.frame_buffer.dirty, {1, 2})
+
+    def test_as_numpy(self):
+        colors = self.frame_buffer.as_numpy()
+        colors[:] = 0xffffffff
+        self.assertEqual(list(self.frame_buffer.colors), [0xffffffff] * 3)
+        self.assertEqual(self.frame_buffer.dirty, set())
+        self.frame_buffer.mark_all_dirty()
+        self.assertEqual(self.frame_buffer.dirty, {0, 1, 2})
+
+    def test_pack_color(self):
+        self.assertEqual(pack_color(0x12345678), 0x12345678)
+        self.assertEqual(pack_color(ckb.RGBColor(1, 2, 3)), 0xff010203)
+
+
+class ColorViewTest(unittest.TestCase):
+    def setUp(self):
+        self.frame_buffer = FrameBuffer(['esc', 'a'])
+        self.color = ColorView(self.frame_buffer, 1)
+
+    def test_channels(self):
+        self.color.argb = (0x80, 0x10, 0x20, 0x30)
+        self.assertEqual(self.frame_buffer.get(1), 0x80102030)
+        self.color.r = 0xff
+        self.color.b = 0x1ff
+        self.assertEqual((self.color.a, self.color.r, self.color.g,
+                          self.color.b), (0x80, 0xff, 0x20, 0xff))
+        self.assertEqual(str(self.color), '80ff20ff')
+        self.assertEqual(self.frame_buffer.get(0), 0)
+        self.assertEqual(self.frame_buffer.dirty, {1})
+
+    def test_key_color(self):
+        key = Key('a', 10, 0, index=1, frame_buffer=self.frame_buffer)
+        key.color = ckb.ARGBColor(0xff, 1, 2, 3)
+        self.assertEqual(self.frame_buffer.get(1), 0xff010203)
+        key.color.g = 0x80
+        self.assertEqual(key.color.argb, (0xff, 1, 0x80, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import numpy
+from ckbpy.effect import Key
+from ckbpy.geometry import KeyGeometry
+from .util import RecordingEffect, session, run
+
+
+class KeyGeometryTest(unittest.TestCase):
+    def setUp(self):
+        # Given out of index order, which the arrays must not follow
+        self.geometry = KeyGeometry([Key('b', 20, 10, index=2),
+                                     Key('esc', 0, 0, index=0),
+                                     Key('a', 10, 0, index=1)])
+
+    def test_coordinates(self):
+        geometry = self.geometry
+        self.assertEqual(len(geometry), 3)
+        self.assertEqual(geometry.x.tolist(), [0, 10, 20])
+        self.assertEqual(geometry.y.tolist(), [0, 0, 10])
+        self.assertEqual((geometry.width, geometry.height), (20, 10))
+        self.assertEqual(geometry.center, (10, 5))
+        self.assertEqual(geometry.nx.tolist(), [0.0, 0.5, 1.0])
+        self.assertEqual(geometry.ny.tolist(), [0.0, 0.0, 1.0])
+
+    def test_polar(self):
+        geometry = self.geometry
+        numpy.testing.assert_allclose(geometry.distance, [125 ** 0.5, 5,
+                                                          125 ** 0.5])
+        numpy.testing.assert_allclose(geometry.normalized_distance,
+                                      [1.0, 5 / 125 ** 0.5, 1.0])
+        # Clockwise from pointing up, with y growing downwards
+        numpy.testing.assert_allclose(
+            geometry.angle, numpy.degrees(numpy.arctan2([-10, 0, 10],
+                                                        [5, 5, -5])) % 360)
+        self.assertAlmostEqual(geometry.angle[1], 0.0)
+
+    def test_distance_from(self):
+        numpy.testing.assert_allclose(self.geometry.distance_from(10, 10),
+                                      [200 ** 0.5, 10, 10])
+
+    def test_project(self):
+        numpy.testing.assert_allclose(self.geometry.project(90),
+                                      [0.0, 0.5, 1.0])
+        numpy.testing.assert_allclose(self.geometry.project(180),
+                                      [0.0, 0.0, 1.0], atol=1e-12)
+
+    def test_empty(self):
+        geometry = KeyGeometry([])
+        self.assertEqual(len(geometry), 0)
+        self.assertEqual(geometry.project(45).tolist(), [])
+
+    def test_single_key(self):
+        geometry = KeyGeometry([Key('esc', 5, 5)])
+        self.assertEqual(geometry.nx.tolist(), [0.0])
+        self.assertEqual(geometry.normalized_distance.tolist(), [0.0])
+
+
+class EffectGeometryTest(unittest.TestCase):
+    def test_rebuilt_with_keymap(self):
+        effect = RecordingEffect()
+        run(effect, session('start'))
+        geometry = effect.geometry
+        self.assertIs(effect.geometry, geometry)
+        self.assertEqual(geometry.x.tolist(), [0, 10, 20])
+        run(effect, session('start', keys=[('esc', 1, 2)]))
+        self.assertEqual(effect.geometry.x.tolist(), [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import numpy
+import ckbpy as ckb
+from ckbpy.framebuffer import FrameBuffer, pack_color
+
+PHASES = numpy.concatenate([numpy.linspace(-0.5, 1.5, 2001),
+                            [0.027, 0.5, 1.0 - 1e-12]])
+
+
+class VectorizedGradientTest(unittest.TestCase):
+    """get_colors_for_phases gives the colors of get_color_for_phase."""
+
+    def assert_matches(self, param):
+        expected = [pack_color(param.get_color_for_phase(phase))
+                    for phase in PHASES]
+        self.assertEqual(param.get_colors_for_phases(PHASES).tolist(),
+                         expected)
+
+    def gradients(self, lut_size):
+        gradient = ckb.Gradient('gradient', lut_size=lut_size)
+        gradient.set_value_from_str('0:ffff0000 50:ff00ff00 100:ff0000ff')
+        agradient = ckb.AGradient('agradient', lut_size=lut_size)
+        agradient.set_value_from_str('0:40102030 30:ff00ff00 100:000000ff')
+        return gradient, agradient
+
+    def test_exact(self):
+        for param in self.gradients(0):
+            self.assert_matches(param)
+
+    def test_lookup_table(self):
+        for param in self.gradients(101):
+            self.assert_matches(param)
+        for param in self.gradients(7):
+            self.assert_matches(param)
+
+    def test_rgb_opaque(self):
+        gradient, _ = self.gradients(0)
+        colors = gradient.get_colors_for_phases(PHASES)
+        self.assertTrue(((colors >> 24) == 0xff).all())
+        self.assertEqual(int(colors[-3]), 0xfff40a00)
+
+    def test_single_stop(self):
+        gradient = ckb.AGradient('gradient', lut_size=0)
+        gradient.set_value_from_str('50:80ff0000')
+        self.assertEqual(gradient.get_colors_for_phases([0.0, 1.0]).tolist(),
+                         [0x80ff0000, 0x80ff0000])
+
+    def test_out(self):
+        gradient, _ = self.gradients(0)
+        frame_buffer = FrameBuffer(['a', 'b', 'c'])
+        frame_buffer.dirty.clear()
+        gradient.get_colors_for_phases([1.0], out=frame_buffer, indices=[2])
+        self.assertEqual(list(frame_buffer.colors), [0, 0, 0xff0000ff])
+        self.assertEqual(frame_buffer.dirty, {2})
+        out = numpy.zeros(3, dtype=numpy.uint32)
+        gradient.get_colors_for_phases([0.0, 0.5, 1.0], out=out)
+        self.assertEqual(out.tolist(), [0xffff0000, 0xff00ff00, 0xff0000ff])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+import io
+import os
+import sys
+import types
+import socket
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from ckbpy.host import (EffectHost, _Server, _connect, _listen, _peer_pid,
+                        default_socket_path)
+from ckbpy.record import session_input
+from ckbpy.shm import SharedFrameReader
+from .util import RecordingEffect, session, frames
+
+
+def serve(host, session_, text):
+    stdout = io.TextIOWrapper(io.BytesIO(), write_through=True)
+    host.serve(session_, io.TextIOWrapper(io.BytesIO(text.encode())),
+               stdout)
+    return stdout.buffer.getvalue().decode()
+
+
+def times(effect):
+    return [call[1] for call in effect.calls if call[0] == 'time']
+
+
+class EffectHostTest(unittest.TestCase):
+    def setUp(self):
+        self.host = EffectHost(RecordingEffect)
+
+    def test_shared_params(self):
+        a = self.host.create_session()
+        b = self.host.create_session()
+        self.assertIs(a.effect.params['speed'], b.effect.params['speed'])
+
+        serve(self.host, a, session('start', 'frame', params=['speed 2.5']))
+        self.assertEqual(b.effect.params['speed'].value, 2.5)
+        self.assertEqual(b.effect.calls, [('params', {'speed'})])
+        self.assertEqual(b.effect.pending_param_changes, {'speed'})
+        self.assertEqual(self.host.sessions, [b])
+
+    def test_late_session_gets_params(self):
+        a = self.host.create_session()
+        serve(self.host, a, session('start', 'frame', params=['speed 2.5']))
+        b = self.host.create_session()
+        self.assertEqual(b.effect.calls, [('params', {'speed'})])
+        self.assertEqual(b.effect.pending_param_changes, {'speed'})
+
+    def test_unchanged_params_skipped(self):
+        a = self.host.create_session()
+        b = self.host.create_session()
+        serve(self.host, a, session(params=['speed 2.5']))
+        serve(self.host, b, session(params=['speed 2.5']))
+        self.assertEqual(b.effect.calls, [('params', {'speed'})])
+
+    def test_shared_clock(self):
+        a = self.host.create_session()
+        b = self.host.create_session()
+        a.effect.handle_time('1.0')
+        # b is behind the shared clock and catches up
+        b.effect.handle_time('0.25')
+        b.effect.handle_time('1.0')
+        a.effect.handle_time('0.5')
+        self.assertEqual(times(a.effect), [1.0, 0.5])
+        self.assertEqual(times(b.effect), [1.0, 0.25])
+        self.assertEqual(self.host.clock, 1.5)
+
+    def test_session_joins_at_shared_time(self):
+        a = self.host.create_session()
+        a.effect.handle_time('1.0')
+        b = self.host.create_session()
+        b.effect.handle_time('0.5')
+        self.assertEqual(times(b.effect), [0.5])
+        self.assertEqual(self.host.clock, 1.5)
+
+    def test_closing(self):
+        self.host.closing = True
+        self.assertIsNone(self.host.create_session())
+
+    def test_environment(self):
+        with tempfile.TemporaryDirectory() as directory:
+            environment = {
+                'CKBPY_STATS': os.path.join(directory, 'stats.json'),
+                'CKBPY_SHARED_FRAMES': os.path.join(directory, '{pid}.shm'),
+                'CKBPY_RECORD': os.path.join(directory, '{pid}.log'),
+            }
+            a = self.host.create_session(101)
+            b = self.host.create_session(102)
+            text = session('start', 'key a down', 'frame')
+            with mock.patch.dict(os.environ, environment):
+                serve(self.host, a, text)
+                serve(self.host, b, session('start', 'frame'))
+
+            # Every session has its own files
+            self.assertEqual(session_input(os.path.join(directory,
+                                                        '101.log')),
+                             text.encode())
+            reader = SharedFrameReader(os.path.join(directory, '101.shm'))
+            self.assertEqual(reader.read()[1][1], 0xff0000ff)
+            reader.close()
+            reader = SharedFrameReader(os.path.join(directory, '102.shm'))
+            self.assertEqual(reader.read()[1][1], 0)
+            reader.close()
+            with open(environment['CKBPY_STATS']) as f:
+                self.assertEqual(len(f.readlines()), 2)
+
+    def test_default_process_ids(self):
+        a = self.host.create_session()
+        b = self.host.create_session()
+        self.assertNotEqual(a.process_id, b.process_id)
+
+
+class SocketPathTest(unittest.TestCase):
+    def script_class(self, module_name, path):
+        module = types.ModuleType(module_name)
+        module.__file__ = path
+        self.addCleanup(sys.modules.pop, module_name, None)
+        sys.modules[module_name] = module
+        return type('Effect', (RecordingEffect,), {'__module__': module_name})
+
+    def test_scripts(self):
+        # Effects run as scripts all live in __main__; tell them apart by
+        # their files
+        a = self.script_class('ckbpy_test_a', '/effects/a.py')
+        b = self.script_class('ckbpy_test_b', '/effects/b.py')
+        a_again = self.script_class('ckbpy_test_a2', '/effects/a.py')
+        self.assertNotEqual(default_socket_path(a), default_socket_path(b))
+        self.assertEqual(default_socket_path(a), default_socket_path(a_again))
+
+    def test_runtime_dir(self):
+        directory = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+        path = default_socket_path(RecordingEffect)
+        self.assertEqual(os.path.dirname(path), directory)
+        self.assertTrue(path.endswith('.sock'))
+
+
+class ServerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'host.sock')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def communicate(self, client, text):
+        client.sendall(text.encode())
+        client.shutdown(socket.SHUT_WR)
+        output = b''
+        while True:
+            data = client.recv(65536)
+            if not data:
+                break
+            output += data
+        client.close()
+        return output.decode()
+
+    def test_peer_pid(self):
+        a, b = socket.socketpair(socket.AF_UNIX)
+        with a, b:
+            self.assertIn(_peer_pid(a), (os.getpid(), None))
+
+    def test_sessions(self):
+        listener, lock_file = _listen(self.path)
+        self.assertIsNotNone(listener)
+        # Only one process can be the host
+        self.assertEqual(_listen(self.path), (None, None))
+
+        host = EffectHost(RecordingEffect)
+        server = _Server(host, self.path, listener, lock_file, linger=0.2)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        a = _connect(self.path)
+        b = _connect(self.path)
+        self.assertIsNotNone(a)
+        self.assertIsNotNone(b)
+        if hasattr(socket, 'SO_PEERCRED'):
+            self.assertEqual([s.process_id for s in host.sessions],
+                             [os.getpid(), os.getpid()])
+        output = self.communicate(a, session('start', 'key a down', 'frame',
+                                             params=['speed 2.5']))
+        self.assertEqual(frames(output),
+                         [{'esc': '00000000', 'a': 'ff0000ff',
+                           'b': '00000000'}])
+        self.assertTrue(output.endswith('end run\n'))
+
+        output = self.communicate(b, session('start', 'frame'))
+        self.assertEqual(len(frames(output)), 1)
+        self.assertEqual(host.params['speed'].value, 2.5)
+
+        # The host exits once no sessions are left
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIsNone(_connect(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
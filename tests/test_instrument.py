@@ -0,0 +1,55 @@
+import unittest
+from ckbpy.bench import run_session
+from ckbpy.instrument import Instrumentation, METHODS
+from .util import RecordingEffect, session, run
+
+SESSION = session('start', 'time 0.1', 'frame', 'key a down', 'time 0.1',
+                  'frame', 'time 0.1', 'frame')
+
+
+class InstrumentationTest(unittest.TestCase):
+    def setUp(self):
+        self.reports = []
+        self.instrumentation = Instrumentation(self.reports.append,
+                                               report_every=2)
+
+    def test_phases(self):
+        effect = RecordingEffect(instrumentation=self.instrumentation)
+        run(effect, SESSION)
+        stats = self.instrumentation.stats()
+        self.assertEqual(stats['frames'], 3)
+        phases = stats['phases']
+        for name in ('frame', 'time', 'key', 'start') + METHODS:
+            self.assertIn(name, phases)
+        self.assertEqual(phases['update_colors']['count'], 3)
+        self.assertEqual(phases['advance_time']['count'], 3)
+        # Every report_every frames and once when the run ends
+        self.assertEqual(len(self.reports), 2)
+
+    def test_detach(self):
+        effect = RecordingEffect(instrumentation=self.instrumentation)
+        run(effect, SESSION)
+        for name in METHODS:
+            self.assertNotIn(name, vars(effect))
+
+    def test_detach_restores_wrappers(self):
+        effect = RecordingEffect()
+        wrapper = effect.update_colors
+        effect.update_colors = wrapper
+        self.instrumentation.attach(effect)
+        self.assertIsNot(effect.update_colors, wrapper)
+        self.instrumentation.detach(effect)
+        self.assertIs(vars(effect)['update_colors'], wrapper)
+        self.assertNotIn('write_frame', vars(effect))
+
+    def test_bench(self):
+        effect = RecordingEffect(instrumentation=self.instrumentation)
+        result = run_session(effect, SESSION)
+        self.assertEqual(result.frames, 3)
+        self.assertEqual(self.instrumentation.frames, 3)
+        for name in METHODS:
+            self.assertNotIn(name, vars(effect))
+
+
+if __name__ == '__main__':
+    unittest.main()
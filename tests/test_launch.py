@@ -0,0 +1,91 @@
+import io
+import os
+import sys
+import unittest
+import tempfile
+import importlib
+import subprocess
+from contextlib import redirect_stdout
+from unittest import mock
+from ckbpy import launch
+
+EFFECT_MODULE = '''
+from tests.util import RecordingEffect
+
+created = []
+
+
+def factory():
+    created.append(True)
+    return RecordingEffect()
+'''
+
+
+class LazyImportTest(unittest.TestCase):
+    def test_import(self):
+        code = ('import sys, ckbpy; ckbpy.Time; '
+                'print(sorted(m for m in sys.modules '
+                'if m.startswith("ckbpy") or m in ("re", "numpy")))')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         cwd=root)
+        self.assertEqual(output.decode().strip(),
+                         "['ckbpy', 'ckbpy.constants']")
+
+    def test_unknown_name(self):
+        import ckbpy
+        self.assertRaises(AttributeError, getattr, ckbpy, 'Missing')
+
+
+class InfoCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.directory.name, 'cached_effect.py')
+        with open(self.source, 'w') as f:
+            f.write(EFFECT_MODULE)
+        sys.path.insert(0, self.directory.name)
+        self.module = importlib.import_module('cached_effect')
+        self.environ = mock.patch.dict(os.environ, {
+            'XDG_CACHE_HOME': os.path.join(self.directory.name, 'cache')})
+        self.environ.start()
+        os.environ.pop('CKBPY_NO_INFO_CACHE', None)
+        os.environ.pop('CKBPY_HOST', None)
+
+    def tearDown(self):
+        self.environ.stop()
+        sys.path.remove(self.directory.name)
+        del sys.modules['cached_effect']
+        self.directory.cleanup()
+
+    def info(self):
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            launch.run(self.module.factory, ['effect', '--ckb-info'])
+        return stdout.getvalue()
+
+    def test_cached(self):
+        info = self.info()
+        self.assertEqual(info, self.module.factory().info_string())
+        del self.module.created[:]
+        self.assertEqual(self.info(), info)
+        self.assertEqual(self.module.created, [])
+
+    def test_source_changed(self):
+        self.info()
+        stat = os.stat(self.source)
+        os.utime(self.source, ns=(stat.st_atime_ns,
+                                  stat.st_mtime_ns + 10 ** 9))
+        del self.module.created[:]
+        self.info()
+        self.assertEqual(len(self.module.created), 1)
+
+    def test_disabled(self):
+        os.environ['CKBPY_NO_INFO_CACHE'] = '1'
+        self.info()
+        self.info()
+        self.assertEqual(len(self.module.created), 2)
+        self.assertFalse(os.path.exists(os.environ['XDG_CACHE_HOME']))
+
+
+if __name__ == '__main__':
+    unittest.main()
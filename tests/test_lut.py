@@ -0,0 +1,82 @@
+import unittest
+import ckbpy as ckb
+from ckbpy.framebuffer import pack_color
+
+STOPS = '0:ffff0000 33:8000ff00 100:400000ff'
+PHASES = [i / 997 for i in range(998)] + [-1.0, 2.0]
+
+
+def gradients(lut_size=None):
+    kwargs = {} if lut_size is None else {'lut_size': lut_size}
+    gradient = ckb.Gradient('gradient', **kwargs)
+    gradient.set_value_from_str(STOPS)
+    agradient = ckb.AGradient('agradient', **kwargs)
+    agradient.set_value_from_str(STOPS)
+    return gradient, agradient
+
+
+def channels(color):
+    return [(color >> shift) & 0xff for shift in (24, 16, 8, 0)]
+
+
+class LookupTableTest(unittest.TestCase):
+    def test_gradient_exact(self):
+        exact, _ = gradients(0)
+        gradient, _ = gradients()
+        for phase in PHASES:
+            self.assertEqual(gradient.get_packed_color_for_phase(phase),
+                             pack_color(exact.interpolate_color(phase)))
+
+    def test_agradient_close(self):
+        _, exact = gradients(0)
+        _, agradient = gradients()
+        for phase in PHASES:
+            looked_up = channels(agradient.get_packed_color_for_phase(phase))
+            expected = channels(pack_color(exact.interpolate_color(phase)))
+            for a, b in zip(looked_up, expected):
+                self.assertLessEqual(abs(a - b), 2)
+
+    def test_small_table(self):
+        _, agradient = gradients(2)
+        self.assertEqual(list(agradient.lut), [0xffff0000, 0x400000ff])
+        self.assertEqual(agradient.get_packed_color_for_phase(0.4),
+                         0xffff0000)
+        self.assertEqual(agradient.get_packed_color_for_phase(0.6),
+                         0x400000ff)
+
+    def test_invalid_size(self):
+        for lut_size in (-1, 1):
+            with self.assertRaises(ValueError):
+                ckb.Gradient('gradient', lut_size=lut_size)
+            with self.assertRaises(ValueError):
+                ckb.AGradient('gradient', lut_size=lut_size)
+
+    def test_invalidated(self):
+        gradient, agradient = gradients()
+        for param in (gradient, agradient):
+            lut = param.lut
+            self.assertIs(param.lut, lut)
+            param.set_value_from_str('0:ff00ff00 100:ff0000ff')
+            self.assertIsNot(param.lut, lut)
+            self.assertEqual((param.lut[0], param.lut[-1]),
+                             (0xff00ff00, 0xff0000ff))
+
+            # Assigning a new value directly works too
+            param.value = param.stops_class.from_str('0:ff0000ff')
+            self.assertEqual(param.get_packed_color_for_phase(0.5),
+                             0xff0000ff)
+
+    def test_fresh_colors(self):
+        gradient, agradient = gradients()
+        for param in (gradient, agradient):
+            color = param.get_color_for_phase(0.5)
+            expected = str(color)
+            color.r = 0
+            self.assertEqual(str(param.get_color_for_phase(0.5)), expected)
+            self.assertIsNot(param.get_color_for_phase(0.5),
+                             param.get_color_for_phase(0.5))
+            self.assertIsInstance(color, param.color_class)
+
+
+if __name__ == '__main__':
+    unittest.main()
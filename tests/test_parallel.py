@@ -0,0 +1,92 @@
+import unittest
+import numpy
+import ckbpy as ckb
+from ckbpy.parallel import ParallelRenderer
+from .util import session, run
+
+KEYS = [(f'k{i}', i % 20 * 10, i // 20 * 10) for i in range(120)]
+
+
+def wave(x, y, time, params, out):
+    phases = (numpy.sin(x * 0.05 + time) * numpy.cos(y * 0.07) + 1) / 2
+    params['gradient'].get_colors_for_phases(phases, out=out)
+
+
+class WaveEffect(ckb.Effect):
+    def __init__(self, **kwargs):
+        gradient = ckb.AGradient('gradient', default_value=(
+            ckb.AGradientColorStops.from_str('0:ff000000 100:ffffffff')))
+        super().__init__(guid='{00000000-0000-0000-0000-000000000004}',
+                         name='Wave', version='0.0.0', year='2017',
+                         author='ckbpy', license='GPL-2.0',
+                         params=[gradient], delta_frames=True,
+                         parallel=ParallelRenderer(wave, **kwargs))
+        self.elapsed = 0.0
+
+    def advance_time(self, delta_t):
+        self.elapsed += delta_t
+
+    def update_colors(self):
+        self.render_parallel(self.elapsed)
+
+
+def wave_session(frames=20):
+    commands = ['start']
+    for i in range(frames):
+        commands.extend(['time 0.05', 'frame'])
+        if i in (3, 4, 12):
+            commands.extend(['begin params',
+                             f'param gradient 0:ff{i:02x}0000%20'
+                             f'100:ff00ff{i:02x}',
+                             'end params'])
+    return session(*commands, keys=KEYS)
+
+
+class ParallelRendererTest(unittest.TestCase):
+    def test_in_process(self):
+        effect = WaveEffect(min_keys=10 ** 6)
+        output = run(effect, wave_session())
+        self.assertIsNone(effect.parallel.pool)
+        self.assertIn('begin frame', output)
+
+    def test_same_as_in_process(self):
+        expected = run(WaveEffect(min_keys=10 ** 6), wave_session())
+        for regions in (None, 2):
+            effect = WaveEffect(processes=3, min_keys=0, regions=regions)
+            self.assertEqual(run(effect, wave_session()), expected)
+            # The pool and shared memory are released after the run
+            self.assertIsNone(effect.parallel.pool)
+            self.assertIsNone(effect.parallel.memory)
+
+    def test_params_sent_on_change(self):
+        effect = WaveEffect(processes=2, min_keys=0, regions=4)
+        renderer = effect.parallel
+        # Whether params were sent, for each pool.map call, by frame time
+        sent = {}
+
+        def setup(geometry):
+            ParallelRenderer.setup(renderer, geometry)
+            pool_map = renderer.pool.map
+
+            def recording_map(function, tasks, chunksize=None):
+                with_params = set(task[4] is not None for task in tasks)
+                self.assertEqual(len(with_params), 1)
+                sent.setdefault(tasks[0][2], []).append(with_params.pop())
+                return pool_map(function, tasks, chunksize)
+            renderer.pool.map = recording_map
+        renderer.setup = setup
+        run(effect, wave_session(frames=8))
+
+        frames = [sent[time] for time in sorted(sent)]
+        self.assertEqual(len(frames), 8)
+        # Params go out with the first frame and the ones after changes
+        self.assertEqual([calls[0] for calls in frames],
+                         [True, False, False, False, True, True, False,
+                          False])
+        # Regions are only ever sent again with the params
+        for calls in frames:
+            self.assertTrue(all(calls[1:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
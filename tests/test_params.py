@@ -0,0 +1,61 @@
+import unittest
+import ckbpy as ckb
+from .util import RecordingEffect, session, run
+
+
+class Rebuilding(RecordingEffect):
+    def __init__(self, **kwargs):
+        super().__init__(params=[ckb.Double('speed', default_value=1.0),
+                                 ckb.Long('size', default_value=1)],
+                         **kwargs)
+
+    def rebuild(self, names):
+        self.calls.append(('rebuild', set(names)))
+
+    def param_changed(self, param):
+        self.calls.append(('param', param.name))
+
+
+class ParamChangesTest(unittest.TestCase):
+    def test_batched(self):
+        effect = Rebuilding()
+        run(effect, session('start', 'frame', params=['speed 2',
+                                                      'size 3']))
+        self.assertEqual(effect.calls, [
+            ('params', {'speed', 'size'}), ('start',),
+            ('rebuild', {'speed', 'size'}), ('frame',),
+        ])
+
+    def test_unchanged_skipped(self):
+        effect = Rebuilding()
+        run(effect, session('start', 'frame',
+                            'begin params', 'param speed 2', 'param size 4',
+                            'end params', 'frame',
+                            'begin params', 'param speed 2', 'end params',
+                            'frame', params=['speed 2', 'size 3']))
+        self.assertEqual(
+            [call for call in effect.calls if call[0] != 'frame'], [
+                ('params', {'speed', 'size'}), ('start',),
+                ('rebuild', {'speed', 'size'}),
+                ('params', {'size'}), ('rebuild', {'size'}),
+            ])
+        self.assertEqual(effect.params['size'].value, 4)
+
+    def test_rebuild_once_per_frame(self):
+        effect = Rebuilding()
+        run(effect, session('start',
+                            'begin params', 'param speed 2', 'end params',
+                            'begin params', 'param size 3', 'end params',
+                            'frame'))
+        self.assertEqual(
+            [call for call in effect.calls if call[0] == 'rebuild'],
+            [('rebuild', {'speed', 'size'})])
+
+    def test_param_changed(self):
+        effect = Rebuilding()
+        ckb.Effect.params_changed(effect, {'speed'})
+        self.assertEqual(effect.calls, [('param', 'speed')])
+
+
+if __name__ == '__main__':
+    unittest.main()
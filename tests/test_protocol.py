@@ -0,0 +1,56 @@
+import unittest
+from ckbpy.protocol import (quote, unquote, split_command, parse_keycount,
+                            parse_keymap_key, parse_param, parse_key_event)
+from .util import RecordingEffect, session, run
+
+
+class ProtocolTest(unittest.TestCase):
+    def test_split_command(self):
+        self.assertEqual(split_command('time 0.5'), ('time', '0.5'))
+        self.assertEqual(split_command('frame'), ('frame', ''))
+        self.assertEqual(split_command('key a down'), ('key', 'a down'))
+
+    def test_parse_keycount(self):
+        self.assertEqual(parse_keycount('keycount 104'), 104)
+        self.assertIsNone(parse_keycount('key esc 0,0'))
+
+    def test_parse_keymap_key(self):
+        self.assertEqual(parse_keymap_key('key esc 12,34'), ('esc', 12, 34))
+        self.assertEqual(parse_keymap_key('key m%20a 0,0'), ('m a', 0, 0))
+        self.assertIsNone(parse_keymap_key('key esc 12'))
+
+    def test_parse_param(self):
+        self.assertEqual(parse_param('param speed 1.5'), ('speed', '1.5'))
+        self.assertEqual(parse_param('param text a%20b'), ('text', 'a b'))
+        self.assertEqual(parse_param('param empty '), ('empty', ''))
+        self.assertIsNone(parse_param('params speed'))
+
+    def test_parse_key_event(self):
+        self.assertEqual(parse_key_event('esc down'),
+                         ('esc', None, None, True))
+        self.assertEqual(parse_key_event('12,34 up'),
+                         (None, 12, 34, False))
+        self.assertIsNone(parse_key_event('esc pressed'))
+        self.assertIsNone(parse_key_event('esc'))
+
+    def test_quote(self):
+        self.assertEqual(quote('a b/c'), 'a%20b/c')
+        self.assertEqual(unquote(quote('a b%')), 'a b%')
+        self.assertEqual(unquote('plain'), 'plain')
+
+
+class CommandDispatchTest(unittest.TestCase):
+    def test_commands(self):
+        effect = RecordingEffect()
+        run(effect, session('start', 'time 0.5', 'key a down', 'unknown',
+                            'key a sideways', 'frame', 'stop',
+                            params=['speed 2']))
+        self.assertEqual(effect.calls, [
+            ('params', {'speed'}), ('start',), ('time', 0.5),
+            ('key', 'a', True), ('frame',),
+        ])
+        self.assertEqual(effect.params['speed'].value, 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import io
+import os
+import tempfile
+import unittest
+from ckbpy.effect import process_path
+from ckbpy.record import (SessionRecorder, read_records, read_sessions,
+                          session_input, replay, MAGIC, SESSION, INPUT,
+                          OUTPUT)
+from .util import RecordingEffect, session, run
+
+
+class RecordTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'session.log')
+
+    def record(self, text, **kwargs):
+        stdin = io.TextIOWrapper(io.BytesIO(text.encode()))
+        stdout = io.TextIOWrapper(io.BytesIO(), write_through=True)
+        RecordingEffect(**kwargs).main_recorded(self.path, stdin, stdout)
+        return stdout.buffer.getvalue().decode()
+
+    def test_records(self):
+        with SessionRecorder(self.path, buffer_size=8) as recorder:
+            recorder.record(INPUT, b'start\n')
+            recorder.record(OUTPUT, b'begin run\n')
+        records = list(read_records(self.path))
+        self.assertEqual([(kind, data) for kind, _, data in records], [
+            (SESSION, b''), (INPUT, b'start\n'), (OUTPUT, b'begin run\n')])
+        timestamps = [timestamp for _, timestamp, _ in records]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_sessions_appended(self):
+        first = session('start', 'frame')
+        second = session('start', 'key a down', 'frame')
+        self.record(first)
+        self.record(second)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(len(MAGIC)), MAGIC)
+        self.assertEqual(len(read_sessions(self.path)), 2)
+        self.assertEqual(session_input(self.path, 0), first.encode())
+        self.assertEqual(session_input(self.path, 1), second.encode())
+
+    def test_replay(self):
+        text = session('start', 'frame', 'key a down', 'time 0.1', 'frame')
+        output = self.record(text)
+        self.assertEqual(output, run(RecordingEffect(), text))
+        self.assertEqual(replay(self.path, RecordingEffect()).decode(),
+                         output)
+        recorded = b''.join(data for kind, _, data
+                            in read_sessions(self.path)[0]
+                            if kind == OUTPUT)
+        self.assertEqual(recorded.decode(), output)
+
+    def test_coalescing(self):
+        text = session('start', 'time 0.1', 'frame', 'time 0.1', 'frame')
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, text.encode())
+        os.close(write_fd)
+        effect = RecordingEffect(coalesce=True)
+        with open(read_fd, 'r') as stdin:
+            effect.main_recorded(
+                self.path, stdin,
+                io.TextIOWrapper(io.BytesIO(), write_through=True))
+        self.assertEqual(effect.dropped_frames, 1)
+        self.assertEqual(session_input(self.path), text.encode())
+
+    def test_truncated(self):
+        self.record(session('start', 'frame'))
+        with open(self.path, 'rb+') as f:
+            f.truncate(os.path.getsize(self.path) - 1)
+        records = list(read_records(self.path))
+        self.assertEqual(records[0][0], SESSION)
+        self.assertNotEqual(records[-1][2][-len(b'end run\n'):],
+                            b'end run\n')
+
+    def test_not_a_recording(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'begin keymap\n')
+        with self.assertRaises(ValueError):
+            list(read_records(self.path))
+
+
+class ProcessPathTest(unittest.TestCase):
+    def test_pid(self):
+        self.assertEqual(process_path('/tmp/{pid}/frames-{pid}'),
+                         f'/tmp/{os.getpid()}/frames-{os.getpid()}')
+
+    def test_other_braces(self):
+        self.assertEqual(process_path('/tmp/{x}-{pid}.log'),
+                         '/tmp/{x}-' + str(os.getpid()) + '.log')
+        self.assertEqual(process_path('/tmp/{'), '/tmp/{')
+
+
+if __name__ == '__main__':
+    unittest.main()
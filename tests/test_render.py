@@ -0,0 +1,48 @@
+import threading
+import unittest
+from .util import RecordingEffect, session, run, frames
+
+
+class Failing(RecordingEffect):
+    def update_colors(self):
+        raise RuntimeError('render failed')
+
+
+class RenderAheadTest(unittest.TestCase):
+    def test_frames(self):
+        commands = ('start', 'key a down', 'frame', 'frame', 'key a up',
+                    'key b down', 'frame', 'frame')
+        output = run(RecordingEffect(render_ahead=True), session(*commands))
+        expected = run(RecordingEffect(), session(*commands))
+        self.assertEqual(len(frames(output)), 4)
+        # Frames lag one frame behind, so only compare settled ones
+        self.assertEqual(frames(output)[-1], frames(expected)[-1])
+        self.assertEqual(frames(output)[1], frames(expected)[1])
+
+    def test_rendered_in_background(self):
+        effect = RecordingEffect(render_ahead=True)
+        threads = set()
+        effect.update_colors = lambda: threads.add(threading.current_thread())
+        run(effect, session('start', 'frame', 'frame'))
+        self.assertEqual([thread.name for thread in threads],
+                         ['ckbpy-render'])
+        self.assertIsNone(effect.render_worker)
+
+    def test_delta_frames(self):
+        output = run(RecordingEffect(render_ahead=True, delta_frames=True),
+                     session('start', 'frame', 'key a down', 'key b down',
+                             'frame', 'frame', 'frame'))
+        # Each key pressed shows up in exactly one of the later frames,
+        # depending on when the background render picked it up
+        changed = [item for frame in frames(output)[1:]
+                   for item in frame.items()]
+        self.assertEqual(sorted(changed),
+                         [('a', 'ff0000ff'), ('b', 'ff0000ff')])
+
+    def test_error(self):
+        self.assertRaises(RuntimeError, run, Failing(render_ahead=True),
+                          session('start', 'frame'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import unittest
+import tempfile
+from array import array
+from ckbpy.shm import SharedFrameWriter, SharedFrameReader
+from .util import RecordingEffect, session, run
+
+
+class SharedFramesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'frames')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        writer = SharedFrameWriter(self.path, ['esc', 'a', 'b'])
+        reader = SharedFrameReader(self.path)
+        self.assertEqual(reader.names, ['esc', 'a', 'b'])
+        self.assertEqual(reader.read(), (0, array('I', [0, 0, 0])))
+
+        writer.write([0xff000000, 0x80ff0000, 0x0000ff00])
+        sequence, colors = reader.read()
+        self.assertEqual(sequence, 2)
+        self.assertEqual(list(colors), [0xff000000, 0x80ff0000, 0x0000ff00])
+
+        writer.write_keys([0, 0, 0x12345678], {2})
+        sequence, colors = reader.read()
+        self.assertEqual(sequence, 4)
+        self.assertEqual(list(colors), [0xff000000, 0x80ff0000, 0x12345678])
+        writer.close()
+        reader.close()
+
+    def test_torn_frame(self):
+        writer = SharedFrameWriter(self.path, ['esc'])
+        reader = SharedFrameReader(self.path)
+        writer._sequence[0] += 1
+        self.assertRaises(TimeoutError, reader.read, retries=3)
+        writer.close()
+        reader.close()
+
+    def test_replaced(self):
+        SharedFrameWriter(self.path, ['esc']).close()
+        reader = SharedFrameReader(self.path)
+        self.assertFalse(reader.replaced())
+        SharedFrameWriter(self.path, ['esc', 'a']).close()
+        self.assertTrue(reader.replaced())
+        reader.open()
+        self.assertEqual(reader.names, ['esc', 'a'])
+        reader.close()
+
+    def test_not_a_frame_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(bytes(64))
+        self.assertRaises(ValueError, SharedFrameReader, self.path)
+
+    def test_effect(self):
+        effect = RecordingEffect(shared_frames=self.path, delta_frames=True)
+        run(effect, session('start', 'frame', 'key b down', 'frame'))
+        reader = SharedFrameReader(self.path)
+        sequence, colors = reader.read()
+        self.assertEqual(sequence, 4)
+        self.assertEqual(list(colors), [0, 0, 0xff0000ff])
+        reader.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
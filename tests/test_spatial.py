@@ -0,0 +1,71 @@
+import math
+import random
+import unittest
+import ckbpy as ckb
+from ckbpy.effect import Key
+from ckbpy.spatial import KeyIndex
+from .util import RecordingEffect, session, run
+
+
+def grid_keys(count=60, seed=0):
+    rng = random.Random(seed)
+    return [Key(f'k{i}', rng.randrange(0, 250), rng.randrange(0, 70),
+                index=i) for i in range(count)]
+
+
+class KeyIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.keys = grid_keys()
+        self.index = KeyIndex(self.keys)
+
+    def test_key_at(self):
+        for key in self.keys:
+            found = self.index.key_at(key.x, key.y)
+            self.assertEqual((found.x, found.y), (key.x, key.y))
+        self.assertIsNone(self.index.key_at(-1, -1))
+
+    def test_key_at_first_wins(self):
+        keys = [Key('a', 0, 0, index=0), Key('b', 0, 0, index=1)]
+        self.assertIs(KeyIndex(keys).key_at(0, 0), keys[0])
+
+    def test_nearest(self):
+        rng = random.Random(1)
+        for _ in range(200):
+            x = rng.uniform(-50, 300)
+            y = rng.uniform(-50, 120)
+            expected = min(math.hypot(k.x - x, k.y - y) for k in self.keys)
+            key = self.index.nearest(x, y)
+            self.assertAlmostEqual(math.hypot(key.x - x, key.y - y),
+                                   expected)
+
+    def test_nearest_max_distance(self):
+        self.assertIsNone(self.index.nearest(1000, 1000, max_distance=10))
+        self.assertIsNone(KeyIndex([]).nearest(0, 0))
+
+    def test_keys_within(self):
+        rng = random.Random(2)
+        for _ in range(50):
+            x = rng.uniform(0, 250)
+            y = rng.uniform(0, 70)
+            radius = rng.uniform(0, 60)
+            expected = set(k.name for k in self.keys
+                           if math.hypot(k.x - x, k.y - y) <= radius)
+            found = set(k.name for k in self.index.keys_within(x, y, radius))
+            self.assertEqual(found, expected)
+        self.assertEqual(KeyIndex([]).keys_within(0, 0, 10), [])
+
+
+class PositionKeypressTest(unittest.TestCase):
+    def test_position_events(self):
+        effect = RecordingEffect(kpmode=ckb.Keypress.POSITION)
+        run(effect, session('start', 'key 10,0 down', 'key 20,5 up',
+                            'key 5,5 down'))
+        self.assertEqual(effect.calls[1:], [('key', 'a', True),
+                                            ('key', 'b', False)])
+        self.assertIs(effect.nearest_key(4, 1), effect.keys['esc'])
+        within = effect.keys_within(15, 0, 10)
+        self.assertEqual(set(key.name for key in within), {'a', 'b'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from ckbpy.types import (RGBColor, ARGBColor, GradientColorStops,
+                         AGradientColorStops, lerp_packed, scale_packed)
+
+
+class ColorTest(unittest.TestCase):
+    def test_rgb_from_str(self):
+        color = RGBColor.from_str('12ab3F')
+        self.assertEqual(color.rgb, (0x12, 0xab, 0x3f))
+        self.assertEqual(str(color), '12ab3f')
+        self.assertEqual(RGBColor.from_str('#ff8000').rgb, (255, 128, 0))
+        for string in ('12ab3', '12ab3fff', 'g0ab3f', '', '#'):
+            self.assertIsNone(RGBColor.from_str(string))
+
+    def test_argb_from_str(self):
+        color = ARGBColor.from_str('80ff0001')
+        self.assertEqual(color.argb, (0x80, 0xff, 0x00, 0x01))
+        self.assertEqual(color.packed, 0x80ff0001)
+        self.assertEqual(str(color), '80ff0001')
+        self.assertEqual(ARGBColor.from_str('#ffffffff').packed, 0xffffffff)
+        for string in ('ff0001', '80ff00010', 'x0ff0001'):
+            self.assertIsNone(ARGBColor.from_str(string))
+
+    def test_packed(self):
+        self.assertEqual(RGBColor(1, 2, 3).packed, 0xff010203)
+        self.assertEqual(RGBColor.from_packed(0x80010203).rgb, (1, 2, 3))
+        self.assertEqual(ARGBColor.from_packed(0x80010203).argb,
+                         (0x80, 1, 2, 3))
+
+    def test_lerp(self):
+        self.assertEqual(lerp_packed(0x00000000, 0xff804020, 0.5),
+                         0x7f402010)
+        self.assertEqual(ARGBColor(0, 0, 0, 0).lerp(
+            ARGBColor(255, 128, 64, 32), 0.5).argb, (127, 64, 32, 16))
+        self.assertEqual(RGBColor(0, 100, 200).lerp(
+            RGBColor(100, 100, 0), 0.25).rgb, (25, 100, 150))
+
+    def test_scale(self):
+        self.assertEqual(scale_packed(0x80102040, 2.0), 0x80204080)
+        self.assertEqual(scale_packed(0x80c0c0c0, 2.0), 0x80ffffff)
+        self.assertEqual(ARGBColor(0x80, 0x10, 0x20, 0x40).scale(0.5).argb,
+                         (0x80, 0x08, 0x10, 0x20))
+        self.assertEqual(RGBColor(200, 10, 0).scale(1.5).rgb, (255, 15, 0))
+
+    def test_blend(self):
+        red = ARGBColor(255, 255, 0, 0)
+        self.assertEqual(red.blend(ARGBColor(0, 0, 255, 0)).packed,
+                         red.packed)
+        self.assertEqual(red.blend(ARGBColor(255, 0, 0, 255)).packed,
+                         0xff0000ff)
+
+
+class GradientColorStopsTest(unittest.TestCase):
+    def test_rgb(self):
+        stops = GradientColorStops.from_str('0:ff0000 100:ff0000ff')
+        self.assertEqual([(p, c.rgb) for p, c in stops.color_stops],
+                         [(0, (255, 0, 0)), (100, (0, 0, 255))])
+        self.assertEqual(str(stops), '0:ff0000 100:0000ff')
+
+    def test_argb(self):
+        stops = AGradientColorStops.from_str('0:80ff0000 100:ff0000ff')
+        self.assertEqual([(p, c.packed) for p, c in stops.color_stops],
+                         [(0, 0x80ff0000), (100, 0xff0000ff)])
+        self.assertEqual(str(stops), '0:80ff0000 100:ff0000ff')
+
+    def test_malformed_stops(self):
+        stops = GradientColorStops.from_str('0:ff0000x 50:ff00 x50:00ff00 '
+                                            '100:00ff00')
+        self.assertEqual([p for p, _ in stops.color_stops], [100])
+        stops = AGradientColorStops.from_str('0:ff0000 0:80ff0000ff '
+                                             '100:80ff0000')
+        self.assertEqual([p for p, _ in stops.color_stops], [100])
+
+
+if __name__ == '__main__':
+    unittest.main()
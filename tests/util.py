@@ -0,0 +1,63 @@
+import io
+import ckbpy as ckb
+
+
+class RecordingEffect(ckb.Effect):
+    """Effect recording its hook calls; a pressed key turns blue."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('params', [ckb.Double('speed', default_value=1.0)])
+        super().__init__(guid='{00000000-0000-0000-0000-000000000000}',
+                         name='Test', version='0.0.0', year='2017',
+                         author='ckbpy', license='GPL-2.0', **kwargs)
+        self.calls = []
+
+    def start(self):
+        self.calls.append(('start',))
+
+    def advance_time(self, delta_t):
+        self.calls.append(('time', delta_t))
+
+    def keypress(self, key, state):
+        self.calls.append(('key', key.name, state))
+        key.color = 0xff0000ff if state else 0xff000000
+
+    def params_changed(self, names):
+        self.calls.append(('params', set(names)))
+
+    def update_colors(self):
+        self.calls.append(('frame',))
+
+
+KEYS = (('esc', 0, 0), ('a', 10, 0), ('b', 20, 5))
+
+
+def session(*commands, keys=KEYS, params=()):
+    """Returns the input of a ckb session running the given commands."""
+    lines = ['begin keymap', f'keycount {len(keys)}']
+    lines.extend(f'key {name} {x},{y}' for name, x, y in keys)
+    lines.extend(['end keymap', 'begin params'])
+    lines.extend(f'param {param}' for param in params)
+    lines.extend(['end params', 'begin run'])
+    lines.extend(commands)
+    lines.append('end run')
+    return '\n'.join(lines) + '\n'
+
+
+def run(effect, text):
+    """Runs an effect on a session's input, returning what it sent."""
+    stdout = io.TextIOWrapper(io.BytesIO(), write_through=True)
+    effect.main(io.StringIO(text), stdout)
+    return stdout.buffer.getvalue().decode()
+
+
+def frames(output):
+    """Parses an effect's output into one {key: color} dict per frame."""
+    parsed = []
+    for line in output.splitlines():
+        if line == 'begin frame':
+            parsed.append({})
+        elif line.startswith('argb '):
+            _, name, color = line.split(' ')
+            parsed[-1][name] = color
+    return parsed